@@ -1,10 +1,22 @@
+import itertools
+
 import streamlit as st
 import numpy as np
-import pandas as pd
-import geopandas as gpd
-import bokeh.plotting as bp
-import bokeh.models as bm
-import bokeh.transform as bt
+
+from wow import clientside, geo, ingest, lod, prefetch, schema, trace, warmup
+from wow.aggregate import TIME_DIMENSIONS, top_n_views
+from wow.cube import DIMENSIONS, DISTINCT_SKETCH, build_cube
+from wow.diskcache import disk_cache, show_cache_info
+from wow.lazy import lazy_import, show_import_report
+from wow.star import Dimension, Star
+
+# bokeh is only imported once the charts are built
+bp = lazy_import('bokeh.plotting')
+bm = lazy_import('bokeh.models')
+bt = lazy_import('bokeh.transform')
+bl = lazy_import('bokeh.layouts')
+
+trace.start('2023 Week 16')
 
 if 'top_num' not in st.session_state:
     st.session_state.top_num = 5
@@ -14,26 +26,10 @@ if 'metrics' not in st.session_state:
 
 st.set_page_config(layout='wide', page_title='2023 Week 16')
 
-# The main widgets
-title = f'Top {st.session_state.top_num} Products - {st.session_state.metrics}'
-st.title(title)
-
-st.sidebar.markdown(
-    'Select the number of products you would like to be included '
-    'and the metric you would like to see in the charts.')
-
-st.sidebar.divider()
-
-top_num = st.sidebar.radio(
-    'Select Top Products',
-    options=np.arange(1, 6, 1),
-    key='top_num')
-
+top_num_opts = np.arange(1, 6, 1)
 metrics_opts = [
     '# of Customers', 'Gross Margin', 'Gross Margin %',
     'Total COGS', 'Total Revenue']
-metrics = st.sidebar.radio(
-    'Select Metric', options=metrics_opts, key='metrics')
 
 fields = {
     '# of Customers': 'Customer Key',
@@ -42,203 +38,271 @@ fields = {
     'Total COGS': 'COGS',
     'Total Revenue': 'Revenue'}
 
-st.sidebar.divider()
-
-# Chart content
-
 # Manipulate data
 file_path = './data/Dataset-Customer Profitability.xlsx'
 geo_file = './data/gadm41_USA_1.json'
+map_x_range, map_y_range = (-14000000, -7000000), (2700000, 6400000)
+map_width = 600
+line_width = 700
+geo_level = geo.level_for(map_width, map_x_range[1] - map_x_range[0])
 
+# Size of the state circles per metric
+scale = {
+    '# of Customers': 15,
+    'Gross Margin': 1/100,
+    'Gross Margin %': 50,
+    'Total COGS': 1/100,
+    'Total Revenue': 1/100}
 
+
+@trace.stage('read_data_from_files')
 @st.cache_data
-def read_data_from_files(file_path, geo_file):
-    # Read data
-    data = pd.read_excel(file_path, sheet_name=None)
+@disk_cache
+def read_data_from_files(file_path, distinct=DISTINCT_SKETCH):
+    # Read data, the sheets are parsed in parallel
+    data = ingest.read_excel(file_path, sheet_name=None)
     customers = data['customer'].merge(
         data['industry'], left_on='Industry ID', right_on='ID', how='left').merge(
         data['state'], left_on='State', right_on='StateCode', how='left')
-    data_customer = data['factsales'].sort_values(by='YearPeriod').reset_index(drop=True).merge(
-        data['product'], on='Product Key', how='left').merge(
-        customers, left_on='Customer Key', right_on='Customer', how='left').merge(
-        data['date'], on='YearPeriod', how='left')
-    data_customer['COGS'] = data_customer.iloc[:, range(6, 12)].sum(axis=1)
-    data_customer['Gross Margin'] = data_customer['Revenue'] - \
-        data_customer['COGS']
-    data_selected = data_customer.loc[:, ['YearPeriod', 'Customer Key', 'Industry',
-                                          'Product', 'State_y', 'Revenue', 'COGS', 'Gross Margin', 'Year', 'Qtr', 'Month']]
-    data_selected['Product'] = data_selected['Product'].fillna('(Blank)')
-    data_selected['Industry'] = data_selected['Industry'].fillna('(Blank)')
-    data_selected['Month'] = pd.Categorical(data_selected['Month'].values,
-                                            categories=['Jan', 'Feb', 'Mar', 'Apr',
-                                                        'May', 'Jun', 'Jul', 'Aug',
-                                                        'Sep', 'Oct', 'Nov', 'Dec'],
-                                            ordered=True)
-    data_selected = data_selected.astype({'Year': 'str'})
-
-    # Read geodata
-    us_df = gpd.read_file(geo_file)
-    us_df_wm = us_df.to_crs(epsg=3857)
-    us_df_wm['center'] = us_df_wm['geometry'].centroid
-    us_df_center = us_df_wm.loc[:, ['NAME_1', 'center']].rename(
-        columns={'center': 'geometry'})
-
-    return {'sales': data_selected, 'patches': us_df_wm, 'points': us_df_center}
+    factsales = data['factsales']
+    factsales['COGS'] = factsales.iloc[:, range(6, 12)].sum(axis=1)
+    factsales['Gross Margin'] = factsales['Revenue'] - factsales['COGS']
+
+    # The facts keep their keys, the labels stay in the small dimensions
+    sales = Star(factsales, schema.FACTSALES, {
+        'Product Key': Dimension(data['product'], 'Product Key', schema.PRODUCT,
+                                 missing={'Product': '(Blank)'}),
+        'Customer Key': Dimension(customers, 'Customer', schema.CUSTOMER,
+                                  missing={'Industry': '(Blank)'}),
+        'YearPeriod': Dimension(data['date'], 'YearPeriod', schema.DATE)})
+    memory = schema.memory_saved(
+        [factsales, data['product'], customers, data['date']], sales.parts())
+    cube = build_cube(sales.rollup(DIMENSIONS + TIME_DIMENSIONS), distinct)
 
+    return {'sales': sales, 'cube': cube, 'memory': memory}
 
+
+@trace.stage('read_states')
 @st.cache_data
-def load_plotting_data(top_num, metrics):
-    data = read_data_from_files(file_path, geo_file)
+@disk_cache
+def read_states(geo_file, level):
+    # Read the precomputed geodata, simplified for the map resolution
+    return geo.load_states(geo_file, level)
+
+
+@trace.stage('load_plotting_data')
+@st.cache_data
+@disk_cache(files=[file_path])
+def load_plotting_data(top_num, metrics, distinct=DISTINCT_SKETCH):
+    data = read_data_from_files(file_path, distinct)
     field = fields[metrics]
-    us_df_json = data['patches'].iloc[:, slice(0, -1)].to_json()
-    if metrics == '# of Customers':
-        table_data = data['sales'].groupby('Product', dropna=False).nunique(
-        ).sort_values(by=field, ascending=False)[[field]]
-        indx = table_data.index[:top_num]
-        filtered_rows = data['sales']['Product'].apply(lambda x: x in indx)
-        bar_data = data['sales'].loc[filtered_rows, :].groupby(
-            'Industry', dropna=False).nunique().sort_values(by=field)[[field]]
-        line_group = data['sales'].loc[filtered_rows, :].groupby(
-            ['Year', 'Qtr', 'Month'], dropna=False, observed=True)
-        line_data = line_group.nunique()[[field]]
-        state_data = data['sales'].loc[filtered_rows, :].groupby('State_y').nunique()[
-            [field]]
-        state_data.index = state_data.index.str.title().str.replace(' ', '')
-        state_data_geo = data['points'].merge(
-            state_data, right_index=True, left_on='NAME_1').to_json()
-
-    elif metrics in ['Gross Margin', 'Total COGS', 'Total Revenue']:
-        table_data = data['sales'].groupby('Product', dropna=False).sum(
-            numeric_only=True).sort_values(by=field, ascending=False)[[field]]
-        indx = table_data.index[:top_num]
-        filtered_rows = data['sales']['Product'].apply(lambda x: x in indx)
-        bar_data = data['sales'].loc[filtered_rows, :].groupby(
-            'Industry', dropna=False).sum(numeric_only=True).sort_values(by=field)[[field]]
-        line_data = data['sales'].loc[filtered_rows, :].groupby(
-            ['Year', 'Qtr', 'Month'], dropna=False, observed=True).sum(numeric_only=True)[[field]]
-        state_data = data['sales'].loc[filtered_rows, :].groupby(
-            'State_y').sum(numeric_only=True)[[field]]
-        state_data.index = state_data.index.str.title().str.replace(' ', '')
-        state_data_geo = data['points'].merge(
-            state_data, right_index=True, left_on='NAME_1').to_json()
-
-    elif metrics == 'Gross Margin %':
-        table_data = data['sales'].groupby('Product', dropna=False).sum(
-            numeric_only=True)[['Revenue', 'Gross Margin']]
-        table_data[field] = table_data['Gross Margin'] / \
-            table_data['Revenue']
-        table_data = table_data.sort_values(by=field, ascending=False)[
-            [field]]
-        indx = table_data.index[:top_num]
-        filtered_rows = data['sales']['Product'].apply(lambda x: x in indx)
-
-        bar_data = data['sales'].loc[filtered_rows, :].groupby(
-            'Industry', dropna=False).sum(numeric_only=True)
-        bar_data[field] = bar_data['Gross Margin'] / bar_data['Revenue']
-        bar_data = bar_data.sort_values(by=field)[[field]]
-
-        line_data = data['sales'].loc[filtered_rows, :].groupby(
-            ['Year', 'Qtr', 'Month'], dropna=False, observed=True).sum(numeric_only=True)
-        line_data[field] = line_data['Gross Margin'] / line_data['Revenue']
-        line_data = line_data[[field]]
-
-        state_data = data['sales'].loc[filtered_rows, :].groupby(
-            'State_y').sum(numeric_only=True)
-        state_data[field] = state_data['Gross Margin'] / \
-            state_data['Revenue']
-        state_data = state_data[[field]]
-        state_data.index = state_data.index.str.title().str.replace(' ', '')
-        state_data_geo = data['points'].merge(
-            state_data, right_index=True, left_on='NAME_1').to_json()
+
+    views = top_n_views(data['cube'].rollup, field, top_num)
+    # Plain labels for bokeh, e.g. the Year as text
+    table_data, bar_data, state_data = (
+        schema.display(views[k]) for k in ['table', 'bar', 'state'])
+    line_data = {level: schema.display(frame) for level, frame in views['line'].items()}
+    state_data.index = state_data.index.str.title().str.replace(' ', '')
 
     return {'table': table_data, 'line': line_data, 'bar': bar_data,
-            'map': {'patches': us_df_json, 'points': state_data_geo}}
+            'state': state_data}
 
 
+@trace.stage('load_client_views')
+@st.cache_data
+@disk_cache(files=[file_path, geo_file])
+def load_client_views(geo_level):
+    # The views of every widget combination, keyed by the widget labels
+    points = read_states(geo_file, geo_level)['points']
+    store = {}
+    for top_num, metrics in itertools.product(top_num_opts, metrics_opts):
+        data = load_plotting_data(top_num, metrics)
+        field = fields[metrics]
+        line_level, line_data = lod.choose(data['line'], line_width)
+        line = clientside.columns(line_data, field)
+        line['x'] = clientside.factors(line_data.index)
+        state_points = points.merge(
+            data['state'], right_index=True, left_on='NAME_1').set_index('NAME_1')
+        state_points['size'] = np.sqrt(state_points[field] / np.pi) * scale[metrics]
+        store[clientside.combo_key(top_num, metrics)] = clientside.view(
+            sources=[clientside.columns(data['table'].head(top_num), field),
+                     line,
+                     clientside.columns(data['bar'], field),
+                     clientside.columns(state_points, field)],
+            ranges=[line['x'], clientside.factors(data['bar'].index)],
+            texts=[f'<h1>Top {top_num} Products - {metrics}</h1>',
+                   f'<h3>{metrics} for Top {top_num} Products</h3>',
+                   f'<h3>{metrics} for Top {top_num} Over Time</h3>',
+                   f'<h3>{metrics} by Industry for Top {top_num} Products</h3>',
+                   f'<h3>{metrics} by State for Top {top_num} Products</h3>'])
+    return store
+
+
+def map_figure(patches):
+    # for reference https://geopandas.org/en/stable/gallery/plotting_basemap_background.html#Matching-coordinate-systems
+    chart_map = bp.figure(x_range=map_x_range, y_range=map_y_range,
+                          width=map_width, height=300,
+                          x_axis_type="mercator", y_axis_type="mercator"
+                          )
+
+    chart_map.add_tile("CartoDB Positron", retina=True)
+    chart_map.patches(xs='xs', ys='ys', source=bm.ColumnDataSource(patches),
+                      line_color='gray', fill_alpha=0)
+
+    chart_map.grid.grid_line_color = None
+    chart_map.axis.axis_line_color = None
+    chart_map.axis.major_tick_line_color = None
+    chart_map.axis.minor_tick_line_color = None
+    chart_map.axis.major_label_text_color = None
+    return chart_map
+
+
+def show_reports():
+    warmup.show_progress(st.sidebar, '2023 Week 16')
+    trace.show_trace(st.sidebar)
+    show_cache_info(st.sidebar)
+    if trace.TRACE_ENABLED:
+        memory = read_data_from_files(file_path)['memory']
+        st.sidebar.caption(
+            f"Sales data: {memory['before_bytes'] / 1024**2:.1f} MB read, "
+            f"{memory['after_bytes'] / 1024**2:.1f} MB in the star schema "
+            f"({memory['ratio']:.1f}x)")
+    show_import_report(st.sidebar)
+
+
+# The map geometry loads in the background while the facts are aggregated,
+# the map is drawn last.
+states = prefetch.submit(read_states, geo_file, geo_level)
+
+# Precompute every other widget combination in the background
+warmup.warm('2023 Week 16', load_plotting_data,
+            {'top_num': top_num_opts, 'metrics': metrics_opts},
+            default={'top_num': 5, 'metrics': '# of Customers'})
+
+if clientside.ENABLED:
+    # One bokeh document holds the widgets and the charts of every widget
+    # combination, the widgets switch between them in the browser.
+    store = load_client_views(geo_level)
+    states = states.result()
+    with trace.stage('bokeh figures'):
+        top_buttons = bm.RadioButtonGroup(
+            labels=[str(n) for n in top_num_opts],
+            active=list(top_num_opts).index(st.session_state.top_num))
+        metrics_buttons = bm.RadioButtonGroup(
+            labels=metrics_opts,
+            active=metrics_opts.index(st.session_state.metrics))
+        view = store[clientside.combo_key(st.session_state.top_num,
+                                          st.session_state.metrics)]
+        sources = [bm.ColumnDataSource(data) for data in view['sources']]
+        source_table, source_line, source_bar, source_map_points = sources
+        ranges = [
+            bm.FactorRange(*(tuple(f) if isinstance(f, list) else f for f in view['ranges'][0]),
+                           group_padding=0, subgroup_padding=0),
+            bm.FactorRange(*view['ranges'][1])]
+        texts = [bm.Div(text=text) for text in view['texts']]
+        clientside.switcher([top_buttons, metrics_buttons], store, sources, ranges, texts)
+
+        chart_table = bm.DataTable(
+            columns=[bm.TableColumn(field='Product', title='Product'),
+                     bm.TableColumn(field='value', title='Value')],
+            source=source_table, width=250, height=150, index_position=None)
+
+        chart_line = bp.figure(width=line_width, height=250, x_range=ranges[0],
+                               tooltips=[("Period", "@x"), ("Value", "@value")])
+        chart_line.line(x='x', y='value', source=source_line)
+
+        chart_bar = bp.figure(width=350, height=500, y_range=ranges[1],
+                              tooltips=[("Industry", "@Industry"), ("Value", "@value")])
+        chart_bar.hbar(y='Industry', right='value', source=source_bar,
+                       line_color='white')
+
+        chart_map = map_figure(states['patches'])
+        r1 = chart_map.circle(x='x', y='y', size='size', source=source_map_points)
+        chart_map.add_tools(bm.HoverTool(
+            tooltips=[("State", "@NAME_1"), ("Value", "@value")], renderers=[r1]))
+
+        period = bm.Div(text='Aug 2013 - Nov 2014')
+        layout = bl.column(
+            texts[0], bl.row(top_buttons, metrics_buttons),
+            bl.row(bl.column(texts[1], period, chart_table),
+                   bl.column(texts[2], chart_line)),
+            bl.row(bl.column(texts[3], chart_bar),
+                   bl.column(texts[4], chart_map)))
+    with trace.stage('st.bokeh_chart'):
+        st.bokeh_chart(layout)
+    show_reports()
+    st.stop()
+
+# The main widgets
+title = f'Top {st.session_state.top_num} Products - {st.session_state.metrics}'
+st.title(title)
+
+st.sidebar.markdown(
+    'Select the number of products you would like to be included '
+    'and the metric you would like to see in the charts.')
+
+st.sidebar.divider()
+
+top_num = st.sidebar.radio(
+    'Select Top Products',
+    options=top_num_opts,
+    key='top_num')
+
+metrics = st.sidebar.radio(
+    'Select Metric', options=metrics_opts, key='metrics')
+
+st.sidebar.divider()
+
+# Chart content
 data = load_plotting_data(top_num, metrics)
 field = fields[metrics]
 
-# source = bm.ColumnDataSource(data_selected)
-source_table = bm.ColumnDataSource(data['table'])
-source_bar = bm.ColumnDataSource(data['bar'])
-source_line = bm.ColumnDataSource(data['line'])
-source_map_patches = bm.GeoJSONDataSource(geojson=data['map']['patches'])
-source_map_points = bm.GeoJSONDataSource(geojson=data['map']['points'])
-
-# Table chart
-columns = [
-    bm.TableColumn(field='Product', title='Product'),
-    bm.TableColumn(field=field, title='Value')]
-chart_table = bm.DataTable(
-    columns=columns, source=source_table,
-    width=250, height=150,
-    index_position=None,
-    view=bm.CDSView(filter=bm.IndexFilter(list(range(top_num)))))
-
-# Line chart
-chart_line = bp.figure(width=700, height=250,
-                       x_range=bm.FactorRange(
-                           *source_line.data['Year_Qtr_Month'], group_padding=0, subgroup_padding=0),
-                       tooltips=[("Month", "@Year_Qtr_Month"), ("Value", f"@{{{field}}}")])
-chart_line.line(x='Year_Qtr_Month', y=field, source=source_line)
-
-# Bar chart
-chart_bar = bp.figure(width=350, height=500, y_range=source_bar.data['Industry'],
-                      tooltips=[("Industry", "@Industry"), ("Value", f"@{{{field}}}")])
-chart_bar.hbar(y='Industry', right=field, source=source_bar,
-               line_color='white')
-
-# Map chart
-chart_map = bp.figure(x_range=(-14000000, -7000000), y_range=(2700000, 6400000),
-                      width=600, height=300,
-                      x_axis_type="mercator", y_axis_type="mercator"
-                      )
-
-chart_map.add_tile("CartoDB Positron", retina=True)
-chart_map.patches(xs='xs', ys='ys', source=source_map_patches,
-                  line_color='gray', fill_alpha=0)
+with trace.stage('bokeh figures'):
+    # source = bm.ColumnDataSource(data_selected)
+    source_table = bm.ColumnDataSource(data['table'])
+    source_bar = bm.ColumnDataSource(data['bar'])
+    # The finest time grain whose points fit the width of the line chart
+    line_level, line_data = lod.choose(data['line'], line_width)
+    line_x = '_'.join(line_data.index.names)
+    source_line = bm.ColumnDataSource(line_data)
+
+    # Table chart
+    columns = [
+        bm.TableColumn(field='Product', title='Product'),
+        bm.TableColumn(field=field, title='Value')]
+    chart_table = bm.DataTable(
+        columns=columns, source=source_table,
+        width=250, height=150,
+        index_position=None,
+        view=bm.CDSView(filter=bm.IndexFilter(list(range(top_num)))))
+
+    # Line chart
+    chart_line = bp.figure(width=line_width, height=250,
+                           x_range=bm.FactorRange(
+                               *source_line.data[line_x], group_padding=0, subgroup_padding=0),
+                           tooltips=[(line_level.title(), f"@{line_x}"), ("Value", f"@{{{field}}}")])
+    chart_line.line(x=line_x, y=field, source=source_line)
+
+    # Bar chart
+    chart_bar = bp.figure(width=350, height=500, y_range=source_bar.data['Industry'],
+                          tooltips=[("Industry", "@Industry"), ("Value", f"@{{{field}}}")])
+    chart_bar.hbar(y='Industry', right=field, source=source_bar,
+                   line_color='white')
 
-scale = {
-    '# of Customers': 15,
-    'Gross Margin': 1/100,
-    'Gross Margin %': 50,
-    'Total COGS': 1/100,
-    'Total Revenue': 1/100}
-
-v_func = f'''
-const norm = new Float64Array(xs.length)
-for (let i = 0; i < xs.length; i++) {{
-    norm[i] = Math.sqrt(xs[i] / Math.PI)*{scale[metrics]};
-}}
-return norm
-'''
-
-js_trans = bm.CustomJSTransform(v_func=v_func)
-r1 = chart_map.circle(x='x', y='y', size=bt.transform(field, js_trans),
-                      source=source_map_points)
-tooltip = bm.HoverTool(
-    tooltips=[("State", "@NAME_1"), ("Value", f"@{{{field}}}")], renderers=[r1])
-chart_map.add_tools(tooltip)
-
-chart_map.grid.grid_line_color = None
-chart_map.axis.axis_line_color = None
-chart_map.axis.major_tick_line_color = None
-chart_map.axis.minor_tick_line_color = None
-chart_map.axis.major_label_text_color = None
-
-# for reference https://geopandas.org/en/stable/gallery/plotting_basemap_background.html#Matching-coordinate-systems
 col1, col2 = st.columns([2, 3])
 
 with col1:
     st.markdown(f'### {metrics} for Top {top_num} Products')
     st.markdown('Aug 2013 - Nov 2014')
-    st.bokeh_chart(chart_table, use_container_width=True)
+    with trace.stage('st.bokeh_chart'):
+        st.bokeh_chart(chart_table, use_container_width=True)
     st.markdown(f'Total: {45}')
 
 with col2:
     st.markdown(f'### {metrics} for Top {top_num} Over Time')
     st.markdown('Aug 2013 - Nov 2014')
-    st.bokeh_chart(chart_line, use_container_width=True)
+    with trace.stage('st.bokeh_chart'):
+        st.bokeh_chart(chart_line, use_container_width=True)
 
 
 col3, col4 = st.columns([2, 3])
@@ -246,9 +310,42 @@ col3, col4 = st.columns([2, 3])
 with col3:
     st.markdown(f'### {metrics} by Industry for Top {top_num} Products')
     st.markdown('Aug 2013 - Nov 2014')
-    st.bokeh_chart(chart_bar, use_container_width=True)
+    with trace.stage('st.bokeh_chart'):
+        st.bokeh_chart(chart_bar, use_container_width=True)
 
 with col4:
     st.markdown(f'### {metrics} by State for Top {top_num} Products')
     st.markdown('Aug 2013 - Nov 2014')
+    map_slot = st.empty()
+    map_slot.caption('Loading the map...')
+
+with trace.stage('wait read_states'):
+    states = states.result()
+
+with trace.stage('bokeh figures'):
+    # The state polygons don't depend on the widgets, only the points do.
+    source_map_points = bm.ColumnDataSource(states['points'].merge(
+        data['state'], right_index=True, left_on='NAME_1'))
+
+    # Map chart
+    chart_map = map_figure(states['patches'])
+
+    v_func = f'''
+    const norm = new Float64Array(xs.length)
+    for (let i = 0; i < xs.length; i++) {{
+        norm[i] = Math.sqrt(xs[i] / Math.PI)*{scale[metrics]};
+    }}
+    return norm
+    '''
+
+    js_trans = bm.CustomJSTransform(v_func=v_func)
+    r1 = chart_map.circle(x='x', y='y', size=bt.transform(field, js_trans),
+                          source=source_map_points)
+    tooltip = bm.HoverTool(
+        tooltips=[("State", "@NAME_1"), ("Value", f"@{{{field}}}")], renderers=[r1])
+    chart_map.add_tools(tooltip)
+
+with map_slot.container(), trace.stage('st.bokeh_chart'):
     st.bokeh_chart(chart_map, use_container_width=True)
+
+show_reports()
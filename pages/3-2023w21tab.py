@@ -1,19 +1,27 @@
 import streamlit as st
-import plotly.express as px
+import numpy as np
 import pandas as pd
 
+from wow import ingest, targets, trace, warmup
+from wow.diskcache import disk_cache, show_cache_info
+from wow.figures import assemble, band_trace, freeze, segments_trace
+from wow.hover import hover
+from wow.lazy import lazy_import, show_import_report
+
+go = lazy_import("plotly.graph_objects")
+
+trace.start("#WOW2023 Week 21")
+
 file_path = "./data/Superstore with Target Profit WOW2023 W21.xlsx"
 
 
+@trace.stage("load_data")
 @st.cache_data
+@disk_cache
 def load_data(file_path):
-    data = pd.read_excel(file_path)
-    data_grouped = (
-        data[data["Order Date"].dt.year == 2023]
-        .groupby(data["Order Date"].dt.month)
-        .sum(numeric_only=True)
-    )
-    return data_grouped
+    # Profit and target per month of every year, a year is then a lookup
+    data = ingest.read_excel(file_path)
+    return targets.monthly_table(data)
 
 
 # Initialize state
@@ -23,9 +31,14 @@ if "tval" not in st.session_state:
 # Widgets
 st.set_page_config(layout="wide", page_title="#WOW2023 Week 21")
 
+warmup.warm("#WOW2023 Week 21", load_data, {"file_path": [file_path]})
+data_table = load_data(file_path)
+years = list(data_table.index.unique("Year"))
+
 col1, col2 = st.columns([4, 1])
 
 with col2:
+    year = st.selectbox("Year", options=years, index=len(years) - 1)
     st.text(f"Tolerance:\nPercent Around Target\n{st.session_state.tval:.0%}")
     tolerance = st.slider(
         "Percent Around Target",
@@ -37,21 +50,11 @@ with col2:
     )
 
 col1.markdown(
-    f"## #WOW2023 Week 21 | 2023 Profit vs Target (with {tolerance:.0%} tolerance)"
+    f"## #WOW2023 Week 21 | {year} Profit vs Target (with {tolerance:.0%} tolerance)"
 )
 
 # Figure
-data_grouped = load_data(file_path)
-lower = data_grouped["Target Profit"] * (1 - tolerance)
-upper = data_grouped["Target Profit"] * (1 + tolerance)
-labels = [
-    "Above Target" if p > u else ("Below Target" if p < l else "On Target")
-    for p, l, u in zip(data_grouped["Profit"], lower, upper)
-]
-
-data_px = data_grouped.reset_index()
-data_px["labels"] = labels
-data_px["month"] = [
+months = [
     "Jan",
     "Feb",
     "Mar",
@@ -65,87 +68,111 @@ data_px["month"] = [
     "Nov",
     "Dec",
 ]
-data_px["profit diff"] = (data_px["Profit"] - data_px["Target Profit"]) / data_px[
-    "Target Profit"
-]
 color_maps = {
     "Above Target": "#91B3D7",
     "On Target": "#BAB0AC",
     "Below Target": "#E15759",
 }
 
-fig = px.bar(
-    data_px,
-    x="Order Date",
-    y="Profit",
-    color="labels",
-    color_discrete_map=color_maps,
-)  # This includes three traces
-
-# We need to update the customdata for each traces of different colors
-for l, c in color_maps.items():
-    fig.update_traces(
-        selector=dict(marker_color=c),
-        customdata=data_px.loc[
-            :, ["month", "Profit", "profit diff", "Target Profit", "labels"]
-        ].query("labels==@l"),
-        hovertemplate=(
-            "<b>%{customdata[0]} 2023</b><br>"
-            "Profit: <b>$%{customdata[1]:,.0f}</b><br>"
-            "%{customdata[2]:.0%} difference from Target ($%{customdata[3]:,.0f})<extra></extra>"
+
+@trace.stage("figure_skeleton")
+@st.cache_resource
+def figure_skeleton():
+    # Everything that doesn't depend on the tolerance
+    fig = go.Figure()
+    fig.update_layout(
+        # paper_bgcolor='yellow',
+        width=900,
+        height=600,
+        barmode="overlay",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            xanchor="left",
+            x=0,
+            y=1,
+            title_text="",
+            font_size=16,
         ),
-        hoverlabel=dict(bgcolor="white", font_size=14),
+        # margin=dict(b=5, t=5, l=5, r=10),
     )
-
-for m, t, l, u in zip(data_px["Order Date"], data_px["Target Profit"], lower, upper):
-    fig.add_shape(type="line", x0=m - 0.4, y0=t, x1=m + 0.4, y1=t, line_color="gray")
-    fig.add_shape(
-        type="rect",
-        x0=m - 0.5,
-        y0=l,
-        x1=m + 0.5,
-        y1=u,
-        line_color="gray",
-        fillcolor="gray",
-        opacity=0.3,
-        layer="below",
+    fig.update_xaxes(
+        tickvals=list(range(1, 13)),
+        ticktext=months,
+        title_text="",
+        tickfont_size=16,
+    )
+    fig.update_yaxes(title_text="", tickfont_size=16)
+
+    fig.add_annotation(
+        text="Workout Wednesday Week 21 | Challenge by L-ZY @LZY_CHN",
+        x=1,
+        y=0,
+        yshift=-30,
+        xref="paper",
+        yref="paper",
+        xanchor="right",
+        yanchor="top",
+        showarrow=False,
+        font=dict(color="gray", size=12),
+        opacity=0.8,
+    )
+    return freeze(fig)
+
+
+with trace.stage("plotly traces"):
+    data_px = targets.year_view(data_table, year, tolerance)
+    data_px["month"] = np.asarray(months)[data_px["Month"] - 1]
+
+    # The tolerance bands, drawn below the profit bars
+    traces = [
+        band_trace(
+            data_px["Month"],
+            data_px["lower"],
+            data_px["upper"],
+            marker_color="gray",
+            marker_line_color="gray",
+            opacity=0.3,
+        )
+    ]
+
+    # One bar trace per label, in the order the labels first appear
+    for l in pd.unique(data_px["labels"]):
+        rows = data_px[data_px["labels"] == l]
+        traces.append(
+            dict(
+                type="bar",
+                x=rows["Month"].to_numpy(),
+                y=rows["Profit"].to_numpy(),
+                name=l,
+                marker_color=color_maps[l],
+                **hover(
+                    f"<b>%{{customdata.month}} {year}</b><br>"
+                    "Profit: <b>$%{customdata.Profit:,.0f}</b><br>"
+                    "%{customdata.diff:.0%} difference from Target ($%{customdata.Target Profit:,.0f})<extra></extra>",
+                    rows,
+                ),
+                hoverlabel=dict(bgcolor="white", font_size=14),
+            )
+        )
+
+    # The target lines, all in one trace
+    traces.append(
+        segments_trace(
+            data_px["Month"] - 0.4,
+            data_px["Target Profit"],
+            data_px["Month"] + 0.4,
+            data_px["Target Profit"],
+            line_color="gray",
+        )
     )
 
-fig.update_layout(
-    # paper_bgcolor='yellow',
-    width=900,
-    height=600,
-    legend=dict(
-        orientation="h",
-        yanchor="bottom",
-        xanchor="left",
-        x=0,
-        y=1,
-        title_text="",
-        font_size=16,
-    ),
-    # margin=dict(b=5, t=5, l=5, r=10),
-)
-fig.update_xaxes(
-    tickvals=data_px["Order Date"],
-    ticktext=data_px["month"],
-    title_text="",
-    tickfont_size=16,
-)
-fig.update_yaxes(title_text="", tickfont_size=16)
-
-fig.add_annotation(
-    text="Workout Wednesday Week 21 | Challenge by L-ZY @LZY_CHN",
-    x=1,
-    y=0,
-    yshift=-30,
-    xref="paper",
-    yref="paper",
-    xanchor="right",
-    yanchor="top",
-    showarrow=False,
-    font=dict(color="gray", size=12),
-    opacity=0.8,
-)
+    fig = assemble(figure_skeleton(), *traces)
+
+with trace.stage("st.plotly_chart"):
+    col1.plotly_chart(fig, use_container_width=True)
 
-col1.plotly_chart(fig, use_container_width=True)
+warmup.show_progress(st.sidebar, "#WOW2023 Week 21")
+trace.show_trace(st.sidebar)
+show_cache_info(st.sidebar)
+show_import_report(st.sidebar)
@@ -0,0 +1,126 @@
+import streamlit as st
+import numpy as np
+
+from wow import superstore, trace, warmup
+from wow.diskcache import disk_cache, show_cache_info
+from wow.figures import assemble, freeze, segments_trace
+from wow.lazy import lazy_import, show_import_report
+from wow.pivot import IncrementalPivot
+
+go = lazy_import("plotly.graph_objects")
+
+trace.start("#WOW2023 Week 20")
+
+file_path = "./data/Sample - Superstore 2019.4.csv"
+months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+@trace.stage("load_data")
+@st.cache_data
+@disk_cache
+def load_data(file_path):
+    # Absorb the extract chunk by chunk into the Sub-Category x month sums
+    pivot = IncrementalPivot(columns=range(1, 13))
+    for chunk in superstore.read_chunks(
+        file_path, usecols=["Sub-Category", "Order Date", "Sales"]
+    ):
+        pivot.add(chunk["Sub-Category"], chunk["Order Date"].dt.month, chunk["Sales"])
+    return pivot
+
+
+def contour_edges(levels):
+    # Cell borders between two neighbours of different levels, as segments
+    rows, cols = np.nonzero(levels[:, 1:] != levels[:, :-1])
+    x_v = cols + 1.5
+    rows_h, cols_h = np.nonzero(levels[1:, :] != levels[:-1, :])
+    y_h = rows_h + 0.5
+    x0 = np.concatenate([x_v, cols_h + 0.5])
+    x1 = np.concatenate([x_v, cols_h + 1.5])
+    y0 = np.concatenate([rows - 0.5, y_h])
+    y1 = np.concatenate([rows + 0.5, y_h])
+    return x0, y0, x1, y1
+
+
+@trace.stage("figure_skeleton")
+@st.cache_resource
+def figure_skeleton():
+    sub_categories = load_data(file_path).frame().index
+    fig = go.Figure()
+    fig.update_layout(
+        template="simple_white",
+        width=900,
+        height=600,
+        margin=dict(t=60),
+    )
+    fig.update_xaxes(
+        side="top",
+        tickvals=list(range(1, 13)),
+        ticktext=months,
+        showline=False,
+        ticks="",
+    )
+    fig.update_yaxes(
+        autorange="reversed",
+        tickvals=list(range(len(sub_categories))),
+        ticktext=list(sub_categories),
+        showline=False,
+        ticks="",
+    )
+    fig.add_annotation(
+        text="#WOW2023 W20 | Data: Superstore | Created by @LZY_CHN",
+        x=1,
+        y=0,
+        yshift=-20,
+        xref="paper",
+        yref="paper",
+        xanchor="right",
+        yanchor="top",
+        showarrow=False,
+        font=dict(color="gray", size=12),
+        opacity=0.8,
+    )
+    return freeze(fig)
+
+
+# Widgets
+st.set_page_config(layout="wide", page_title="#WOW2023 Week 20")
+st.title("#WOW2023 Week 20: Can you build a heat map with bathymetry lines?")
+st.markdown("### Cumulative % of yearly sales by Sub-Category")
+
+# Figure
+warmup.warm("#WOW2023 Week 20", load_data, {"file_path": [file_path]})
+sub_categories, sales_pct = load_data(file_path).cumulative_pct()
+with trace.stage("plotly traces"):
+    sales_contour = np.round(sales_pct * 50, -1)
+
+    # The percentages are drawn by the heatmap itself, in one trace
+    heatmap = dict(
+        type="heatmap",
+        x=np.arange(1, 13),
+        y=np.arange(len(sub_categories)),
+        customdata=np.repeat(np.asarray(sub_categories)[:, None], 12, axis=1),
+        z=sales_contour,
+        zmin=-25,
+        zmax=sales_contour.max(),
+        colorscale="Blues",
+        showscale=False,
+        xgap=0.5,
+        ygap=0.5,
+        text=sales_pct,
+        texttemplate="%{text:.0%}",
+        hovertemplate="%{customdata}, %{x}<br>Cumulative sales: %{text:.1%}<extra></extra>",
+    )
+
+    x0, y0, x1, y1 = contour_edges(sales_contour)
+    bathymetry_lines = segments_trace(x0, y0, x1, y1, line_color="white", line_width=2)
+
+    fig = assemble(figure_skeleton(), heatmap, bathymetry_lines)
+
+with trace.stage("st.plotly_chart"):
+    st.plotly_chart(fig, use_container_width=True)
+
+warmup.show_progress(st.sidebar, "#WOW2023 Week 20")
+trace.show_trace(st.sidebar)
+show_cache_info(st.sidebar)
+show_import_report(st.sidebar)
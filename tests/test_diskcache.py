@@ -0,0 +1,96 @@
+import os
+import time
+
+import pandas as pd
+
+from wow import diskcache
+from wow.diskcache import disk_cache
+
+
+def counting(tmp_path, **options):
+    calls = []
+
+    @disk_cache(cache_dir=tmp_path / 'cache', **options)
+    def load(path, n):
+        calls.append((path, n))
+        return pd.DataFrame({'n': [n]})
+    return load, calls
+
+
+def test_results_are_reused_until_the_file_argument_changes(tmp_path):
+    load, calls = counting(tmp_path)
+    source = tmp_path / 'data.csv'
+    source.write_text('a')
+    first = load(str(source), 1)
+    pd.testing.assert_frame_equal(load(str(source), 1), first)
+    load(str(source), 2)
+    assert len(calls) == 2
+
+    source.write_text('ab')
+    load(str(source), 1)
+    assert len(calls) == 3
+
+
+def test_listed_files_invalidate_results(tmp_path):
+    data = tmp_path / 'data.xlsx'
+    data.write_text('a')
+    load, calls = counting(tmp_path, files=[data])
+    load('x', 1)
+    data.write_text('ab')
+    load('x', 1)
+    assert len(calls) == 2
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path):
+    load, calls = counting(tmp_path)
+    for n in range(3):
+        load('x', n)
+        # mtimes of the blobs one second apart, oldest first
+        for blob in (tmp_path / 'cache').glob('*/*.arrow'):
+            os.utime(blob, (blob.stat().st_mtime - 1,) * 2)
+    sizes = sorted(p.stat().st_size for p in (tmp_path / 'cache').glob('*/*.arrow'))
+    total = diskcache.evict(tmp_path / 'cache', max_bytes=sum(sizes[:2]))
+    assert diskcache.cache_info(tmp_path / 'cache')['entries'] == 2
+    assert total <= sum(sizes[:2])
+    load('x', 2)
+    assert len(calls) == 3
+    load('x', 0)
+    assert len(calls) == 4
+
+
+def test_stale_temporary_files_are_evicted(tmp_path):
+    folder = tmp_path / 'cache' / 'ab'
+    folder.mkdir(parents=True)
+    stale, fresh = folder / '.tmp-stale', folder / '.tmp-fresh'
+    stale.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    old = time.time() - diskcache.STALE_SECONDS - 1
+    os.utime(stale, (old, old))
+    diskcache.evict(tmp_path / 'cache')
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_hit_survives_a_blob_evicted_meanwhile(tmp_path, monkeypatch):
+    load, calls = counting(tmp_path)
+    load('x', 1)
+
+    def evicted(path, times):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(diskcache.os, 'utime', evicted)
+    assert load('x', 1)['n'].tolist() == [1]
+    assert len(calls) == 1
+
+
+def test_defaults_are_part_of_the_key(tmp_path):
+    calls = []
+
+    def load(n, mode='exact'):
+        calls.append((n, mode))
+        return n
+    cached = disk_cache(load, cache_dir=tmp_path / 'cache')
+    cached(1)
+    cached(n=1, mode='exact')
+    load.__defaults__ = ('hll',)
+    cached(1)
+    assert calls == [(1, 'exact'), (1, 'hll')]
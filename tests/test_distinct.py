@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from wow.distinct import hll_count, hll_states, merge_states, set_count, set_states
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    cells = rng.integers(0, 50, 20_000)
+    values = rng.integers(0, 3_000, 20_000)
+    return cells, values
+
+
+def distinct_per_group(group_ids, values, n_groups):
+    return [len(np.unique(values[group_ids == g])) for g in range(n_groups)]
+
+
+def test_set_count_matches_unique(rows):
+    cells, values = rows
+    states = set_states(cells, values, 50)
+    groups = np.arange(50) % 7
+    expected = distinct_per_group(groups[cells], values, 7)
+    np.testing.assert_array_equal(set_count(states, groups, 7), expected)
+
+
+def test_dropped_groups_are_not_counted(rows):
+    cells, values = rows
+    states = set_states(cells, values, 50)
+    groups = np.where(np.arange(50) < 10, 0, -1)
+    expected = len(np.unique(values[cells < 10]))
+    np.testing.assert_array_equal(set_count(states, groups, 1), [expected])
+
+
+def test_states_hold_only_the_entries_set(rows):
+    cells, values = rows
+    states = set_states(cells, values, 50)
+    assert len(states.keys) == len(np.unique(cells * 3_000 + values))
+    # A dense state would take a register array per cell.
+    assert hll_states(cells, values, 50).nbytes < 50 * 4096
+
+
+@pytest.mark.parametrize('build, count', [
+    (lambda c, v, n: set_states(c, v, n, n_values=3_000), set_count),
+    (hll_states, hll_count)])
+def test_merged_partitions_match_one_pass(rows, build, count):
+    cells, values = rows
+    whole = build(cells, values, 50)
+    parts = [build(cells[i::3], values[i::3], 50) for i in range(3)]
+    # The cells of each partition follow those of the previous ones.
+    merged = merge_states(parts, np.tile(np.arange(50), 3), 50)
+    np.testing.assert_array_equal(merged.groups, whole.groups)
+    np.testing.assert_array_equal(merged.keys, whole.keys)
+    if whole.ranks is not None:
+        np.testing.assert_array_equal(merged.ranks, whole.ranks)
+    groups = np.arange(50) // 10
+    np.testing.assert_array_equal(count(merged, groups, 5), count(whole, groups, 5))
+
+
+@pytest.mark.parametrize('n_values', [10, 1_000, 100_000])
+def test_hll_estimate_is_close(n_values):
+    values = np.arange(n_values)
+    states = hll_states(np.zeros(n_values, dtype=np.int64), values, 1)
+    estimate = hll_count(states, np.zeros(1, dtype=np.int64), 1)[0]
+    assert abs(estimate - n_values) <= max(0.05 * n_values, 1)
+
+
+def test_empty_groups_count_zero():
+    cells, values = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    np.testing.assert_array_equal(set_count(set_states(cells, values, 3), np.arange(3), 3), [0, 0, 0])
+    np.testing.assert_array_equal(hll_count(hll_states(cells, values, 3), np.arange(3), 3), [0, 0, 0])
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from wow import ingest
+
+
+def test_mixed_columns_keep_missing_cells(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    frame = pd.DataFrame({'code': ['A', 3, np.nan], 'value': [1.0, 2.0, 3.0]})
+    frames = ingest.cached(source, 'test', {}, lambda: {'sheet': frame},
+                           tmp_path / 'cache')
+    code = frames['sheet']['code']
+    assert code.tolist()[:2] == ['A', '3']
+    assert code.isna().tolist() == [False, False, True]
+
+
+def counting_parse(calls):
+    def parse():
+        calls.append(1)
+        return {'sheet': pd.DataFrame({'value': [len(calls)]})}
+    return parse
+
+
+def test_cache_rebuilds_only_when_the_content_changes(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    calls = []
+    parse = counting_parse(calls)
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert len(calls) == 1
+
+    # Touched, same content
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert len(calls) == 1
+
+    source.write_text('v2')
+    frames = ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert len(calls) == 2
+    assert frames['sheet']['value'].tolist() == [2]
+
+
+def test_rebuild_removes_the_replaced_files(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    parse = counting_parse([])
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    source.write_text('v2')
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    entry, = (tmp_path / 'cache').iterdir()
+    assert len(list(entry.glob('*.arrow'))) == 1
+
+
+def test_entries_of_another_format_are_rebuilt(tmp_path, monkeypatch):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    calls = []
+    parse = counting_parse(calls)
+    monkeypatch.setattr(ingest, 'FORMAT_VERSION', ingest.FORMAT_VERSION - 1)
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    monkeypatch.undo()
+    frames = ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert len(calls) == 2
+    assert frames['sheet']['value'].tolist() == [2]
+    entry, = (tmp_path / 'cache').iterdir()
+    assert len(list(entry.glob('*.arrow'))) == 1
+
+
+def test_rebuild_keeps_the_files_of_other_writers(tmp_path, monkeypatch):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    parse = counting_parse([])
+    monkeypatch.setattr(ingest, 'FORMAT_VERSION', ingest.FORMAT_VERSION - 1)
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    monkeypatch.undo()
+    entry, = (tmp_path / 'cache').iterdir()
+    # Written by another process rebuilding the same entry meanwhile
+    other = entry / 'abcd1234-0.arrow'
+    other.write_bytes(b'')
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert other.exists()
+
+
+def test_entries_missing_data_files_are_rebuilt(tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('v1')
+    calls = []
+    parse = counting_parse(calls)
+    ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    entry, = (tmp_path / 'cache').iterdir()
+    for f in entry.glob('*.arrow'):
+        f.unlink()
+    frames = ingest.cached(source, 'test', {}, parse, tmp_path / 'cache')
+    assert len(calls) == 2
+    assert frames['sheet']['value'].tolist() == [2]
@@ -0,0 +1,21 @@
+from wow import lazy
+
+
+def run_page(path, code):
+    exec(code, {'__file__': path, 'lazy_import': lazy.lazy_import})
+
+
+def test_imports_are_reported_for_the_page_that_ran_them(tmp_path, monkeypatch):
+    (tmp_path / 'wow_heavy_test.py').write_text('VALUE = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(lazy, 'import_times', {})
+    code = "heavy = lazy_import('wow_heavy_test')\nheavy.VALUE\n"
+
+    run_page('page1.py', code)
+    run_page('page3.py', code)
+    # A rerun of the first page keeps the cost of its first run.
+    run_page('page1.py', code)
+
+    assert lazy.import_times['page1.py']['wow_heavy_test'][1] >= 1
+    assert lazy.import_times['page3.py']['wow_heavy_test'] == (0.0, 0)
+    assert 'wow_heavy_test' not in lazy.format_report('page2.py')
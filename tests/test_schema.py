@@ -0,0 +1,17 @@
+import pandas as pd
+
+from wow.schema import compact
+
+
+def test_measures_keep_values_float32_would_round():
+    frame = pd.DataFrame({'Revenue': [1234.5678, 1.0]})
+    result = compact(frame, {'Revenue': 'measure'})
+    assert result['Revenue'].dtype == 'float64'
+    assert result['Revenue'].tolist() == [1234.5678, 1.0]
+
+
+def test_measures_exact_in_float32_are_downcast():
+    frame = pd.DataFrame({'Revenue': [1.5, 2.25, None]})
+    result = compact(frame, {'Revenue': 'measure'})
+    assert result['Revenue'].dtype == 'float32'
+    pd.testing.assert_series_equal(result['Revenue'].astype('float64'), frame['Revenue'])
@@ -0,0 +1 @@
+"""Shared data and figure helpers for the Workout Wednesday pages."""
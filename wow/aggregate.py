@@ -0,0 +1,49 @@
+"""Metrics and views shared by the dashboard pages.
+
+Every metric of a view comes from one grouping of the cells of the cube
+(``wow.cube``): additive measures are summed, distinct counts merge the
+states of their cells (``wow.distinct``), and ratio metrics are derived
+afterwards from the summed components. Row filters are boolean masks built
+from categorical codes, never Python-level loops.
+"""
+import numpy as np
+import pandas as pd
+
+from wow.lod import LEVELS
+
+SUMS = ['Revenue', 'COGS', 'Gross Margin']
+DISTINCT = ['Customer Key']
+# Ratio metrics as (numerator, denominator) of summed components.
+RATIOS = {'Gross Margin %': ('Gross Margin', 'Revenue')}
+
+TIME_DIMENSIONS = ['Year', 'Qtr', 'Month']
+
+
+def isin_mask(column, values):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        wanted = column.cat.categories.get_indexer(pd.Index(values))
+        return np.isin(column.cat.codes.to_numpy(), wanted[wanted >= 0])
+    return column.isin(values).to_numpy()
+
+
+def add_ratios(result):
+    for name, (num, den) in RATIOS.items():
+        result[name] = result[num] / result[den]
+    return result
+
+
+def top_n_views(rollup, field, top_num):
+    """Build the table/bar/line/state views of the top products by ``field``.
+
+    ``rollup(by, products=None, dropna=True)`` is ``Cube.rollup``, which
+    returns every metric per group.
+    """
+    table = rollup('Product').sort_values(by=field, ascending=False)[[field]]
+    products = table.index[:top_num]
+    return {
+        'table': table,
+        'bar': rollup('Industry', products).sort_values(by=field)[[field]],
+        # Every time grain, for wow.lod to choose from
+        'line': {level: rollup(by, products, dropna=False)[[field]]
+                 for level, by in LEVELS.items()},
+        'state': rollup('State_y', products)[[field]]}
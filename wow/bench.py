@@ -0,0 +1,358 @@
+"""Benchmarks of the page loaders, reruns and figures.
+
+``python -m wow.bench`` runs every page outside of a Streamlit server, once
+per data scale and each time in a fresh process, so that load times start
+cold and the peak RSS belongs to that run alone:
+
+* the page is executed up to its ``warmup.warm`` declaration with
+  ``st.cache_data`` and ``st.cache_resource`` replaced by a plain memo. Its
+  loader is timed on the default widgets with empty ingest and disk caches
+  (cold), then again with only the on-disk caches filled (warm, as a new
+  replica would see it), from the parsed data serially and with the
+  partitioned aggregations of ``wow.parallel`` (speedup), and recomputed
+  without caches for every widget combination of the declaration;
+* the page is then driven through ``streamlit.testing`` over every
+  combination of its widgets, timing each rerun and measuring the serialized
+  size of the charts sent to the browser.
+
+The scaled runs replicate the fact sheets of the Excel workbooks in memory
+(the keys of each copy made distinct, so that the number of customers and
+districts grows too) and read a replicated copy of the CSV extracts.
+
+Results are written as JSON, ``--compare`` lines up two of them::
+
+    python -m wow.bench --scales 1 10 --output after.json
+    python -m wow.bench --compare before.json after.json
+"""
+import argparse
+import functools
+import itertools
+import json
+import pickle
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from wow import diskcache, ingest, parallel, warmup
+
+PAGES = sorted(str(p) for p in Path('pages').glob('*.py'))
+SCALES = [1, 10, 100]
+WORK_DIR = Path('./data/.cache/bench')
+
+# Sheets replicated in the scaled runs, with the keys made distinct per copy.
+# Dimension sheets are left alone, a page reading one sheet gets it scaled.
+SCALED_SHEETS = {
+    'factsales': ['Customer Key'],
+    'customer': ['Customer'],
+    'Population - Males': ['district'],
+    'Population - Females': ['district'],
+}
+KEY_OFFSET = 1_000_000
+CHARTS = ['plotly_chart', 'bokeh_chart', 'vega_lite_chart', 'deck_gl_json_chart']
+SUMMARY = ['load_cold_s', 'load_warm_s', 'speedup', 'recompute_s', 'rerun_s',
+           'figure_bytes', 'peak_rss_mb']
+
+
+_memos = []
+
+
+def _memo(func=None, **options):
+    # Stand-in for st.cache_data and st.cache_resource
+    if func is None:
+        return _memo
+    results = {}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = pickle.dumps((args, sorted(kwargs.items())))
+        if key not in results:
+            results[key] = func(*args, **kwargs)
+        return results[key]
+
+    wrapper.clear = results.clear
+    _memos.append(wrapper)
+    return wrapper
+
+
+def scale_frame(df, factor, keys=()):
+    copies = []
+    for i in range(factor):
+        copy = df.copy()
+        for key in keys if i else ():
+            if pd.api.types.is_numeric_dtype(copy[key]):
+                copy[key] = copy[key] + i * KEY_OFFSET
+            else:
+                copy[key] = copy[key].astype(str) + f' #{i}'
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def _scaled_excel(read_excel, factor):
+    def reader(*args, **kwargs):
+        data = read_excel(*args, **kwargs)
+        if not isinstance(data, dict):
+            return scale_frame(data, factor)
+        return {name: scale_frame(df, factor, SCALED_SHEETS[name])
+                if name in SCALED_SHEETS else df for name, df in data.items()}
+    return reader
+
+
+def _scaled_csv(read_csv, factor, work_dir):
+    def reader(path, *args, **kwargs):
+        copy = Path(work_dir) / f'x{factor}-{Path(path).name}'
+        if not copy.exists():
+            header, *rows = Path(path).read_bytes().splitlines(keepends=True)
+            if rows and not rows[-1].endswith(b'\n'):
+                rows[-1] += b'\n'
+            copy.write_bytes(header + b''.join(rows) * factor)
+        return read_csv(copy, *args, **kwargs)
+    return reader
+
+
+def _summary(values):
+    if not values:
+        return None
+    return {'n': len(values), 'median': float(np.median(values)),
+            'min': float(np.min(values)), 'max': float(np.max(values))}
+
+
+def _peak_rss_mb():
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024**2 if sys.platform == 'darwin' else 1024)
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return time.perf_counter() - start, value
+
+
+def load_page(path):
+    """Execute ``path`` up to its ``warm`` call with the st caches stubbed.
+
+    Returns the warmed loader and its widget combinations, defaults first.
+    """
+    import streamlit as st
+
+    warmup.scheduler = warmup.Scheduler()
+    warmup.scheduler.collect_only = True
+    cache_data, cache_resource = st.cache_data, st.cache_resource
+    st.cache_data = st.cache_resource = _memo
+    try:
+        exec(compile(Path(path).read_text(), path, 'exec'),
+             {'__name__': '__bench__', '__file__': path})
+    except warmup.StopPage:
+        pass
+    finally:
+        st.cache_data, st.cache_resource = cache_data, cache_resource
+    queue = sorted(warmup.scheduler.queue, key=lambda item: item[:2])
+    if not queue:
+        return None, []
+    return queue[0][3], [kwargs for *_, kwargs in queue]
+
+
+def bench_loaders(path, work_dir, repeat):
+    func, combos = load_page(path)
+    if func is None:
+        return {}
+    result = {}
+    result['load_cold_s'], _ = _timed(func, **combos[0])
+
+    # A new process: nothing in memory, the ingest and disk caches on disk
+    for memo in _memos:
+        memo.clear()
+    result['load_warm_s'], _ = _timed(func, **combos[0])
+
+    # The loaders from the parsed data, serially and on row partitions
+    workers = parallel.WORKERS
+    for name, count in [('serial_s', 1), ('parallel_s', workers)]:
+        parallel.WORKERS = count
+        for memo in _memos:
+            memo.clear()
+        diskcache.CACHE_DIR = Path(work_dir) / name
+        result[name], _ = _timed(func, **combos[0])
+    result['speedup'] = result['serial_s'] / result['parallel_s']
+
+    # Every widget combination, with only the loader itself uncached
+    recompute = []
+    for i, kwargs in enumerate(combos):
+        times = []
+        for r in range(repeat):
+            func.clear()
+            diskcache.CACHE_DIR = Path(work_dir) / 'recompute' / f'{i}-{r}'
+            times.append(_timed(func, **kwargs)[0])
+        recompute.append({'widgets': {k: str(v) for k, v in kwargs.items()},
+                          'seconds': min(times)})
+    diskcache.CACHE_DIR = Path(work_dir) / 'results'
+    result['recompute_s'] = _summary([c['seconds'] for c in recompute])
+    result['recompute'] = recompute
+    return result
+
+
+def _widget_space(at):
+    space = []
+    for widget in list(at.radio) + list(at.selectbox):
+        space.append((widget.key or widget.id, widget.type, widget.options))
+    for widget in at.slider:
+        proto = widget.proto
+        values = np.arange(proto.min, proto.max + proto.step / 2, proto.step)
+        space.append((widget.key or widget.id, widget.type,
+                      [round(float(v), 10) for v in values]))
+    return space
+
+
+def _find(at, key, kind):
+    for widget in getattr(at, kind):
+        if (widget.key or widget.id) == key:
+            return widget
+
+
+def _chart_bytes(at):
+    return sum(element.proto.ByteSize()
+               for kind in CHARTS for element in at.get(kind))
+
+
+def bench_reruns(path, max_combos, seed=0):
+    from streamlit.testing.v1 import AppTest
+
+    # No background warm-up competing with the timed reruns
+    warmup.scheduler = warmup.Scheduler(workers=0)
+    at = AppTest.from_file(str(Path(path).resolve()), default_timeout=3600)
+    first, _ = _timed(at.run)
+    if at.exception:
+        return {'error': at.exception[0].message}
+
+    space = _widget_space(at)
+    combos = list(itertools.product(*(options for *_, options in space)))
+    if max_combos and len(combos) > max_combos:
+        combos = random.Random(seed).sample(combos, max_combos)
+
+    reruns = []
+    for values in combos:
+        for (key, kind, _), value in zip(space, values):
+            _find(at, key, kind).set_value(value)
+        seconds, _ = _timed(at.run)
+        if at.exception:
+            return {'error': at.exception[0].message}
+        reruns.append({'widgets': dict(zip((key for key, *_ in space), map(str, values))),
+                       'seconds': seconds, 'bytes': _chart_bytes(at)})
+    return {'first_run_s': first,
+            'rerun_s': _summary([r['seconds'] for r in reruns]),
+            'figure_bytes': _summary([r['bytes'] for r in reruns]),
+            'reruns': reruns}
+
+
+def run_case(path, scale, repeat=1, max_combos=None):
+    """Benchmark one page at one scale, meant to run in a fresh process."""
+    import streamlit.logger
+
+    streamlit.logger.set_log_level('error')
+    work_dir = Path(tempfile.mkdtemp(prefix=f'x{scale}-', dir=WORK_DIR))
+    ingest.CACHE_DIR = work_dir / 'ingest'
+    diskcache.CACHE_DIR = work_dir / 'results'
+    if scale > 1:
+        ingest.parse_excel = _scaled_excel(ingest.parse_excel, scale)
+        pd.read_csv = _scaled_csv(pd.read_csv, scale, work_dir)
+
+    result = {'page': path, 'scale': scale}
+    try:
+        result.update(bench_loaders(path, work_dir, repeat))
+        result['loaders_peak_rss_mb'] = _peak_rss_mb()
+        result.update(bench_reruns(path, max_combos))
+    except Exception as e:
+        result['error'] = repr(e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pages=PAGES, scales=SCALES, repeat=1, max_combos=None):
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    results = []
+    for scale, path in itertools.product(scales, pages):
+        with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+            result = pool.submit(run_case, path, scale, repeat, max_combos).result()
+        results.append(result)
+        print(format_row(result), file=sys.stderr)
+    return {'commit': _commit(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(), 'pandas': pd.__version__,
+            'machine': platform.platform(), 'results': results}
+
+
+def _value(result, metric):
+    value = result.get(metric)
+    return value['median'] if isinstance(value, dict) else value
+
+
+def format_row(result):
+    cells = [f'{Path(result["page"]).stem} x{result["scale"]}']
+    for metric in SUMMARY:
+        value = _value(result, metric)
+        cells.append(f'{metric}={value:.4g}' if value is not None else f'{metric}=-')
+    if 'error' in result:
+        cells.append(f'error={result["error"]}')
+    return '  '.join(cells)
+
+
+def compare(before, after):
+    """Print the ratio after/before of each summary metric, page by page."""
+    index = {(r['page'], r['scale']): r for r in before['results']}
+    print(f'{before["commit"]} -> {after["commit"]}')
+    for result in after['results']:
+        base = index.get((result['page'], result['scale']))
+        if base is None:
+            continue
+        cells = [f'{Path(result["page"]).stem} x{result["scale"]}']
+        for metric in SUMMARY:
+            old, new = _value(base, metric), _value(result, metric)
+            if old and new is not None:
+                cells.append(f'{metric} {new / old:.2f}x')
+        print('  '.join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m wow.bench',
+                                     description=__doc__.splitlines()[0])
+    parser.add_argument('pages', nargs='*', default=PAGES)
+    parser.add_argument('--scales', nargs='+', type=int, default=SCALES)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='recomputations per widget combination, the fastest is kept')
+    parser.add_argument('--max-combos', type=int,
+                        help='rerun a random sample of the widget combinations')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        before, after = (json.loads(Path(p).read_text()) for p in args.compare)
+        compare(before, after)
+        return
+    report = run(args.pages, args.scales, args.repeat, args.max_combos)
+    Path(args.output).write_text(json.dumps(report, indent=1))
+
+
+if __name__ == '__main__':
+    # Child processes look the functions up in wow.bench, not in __main__.
+    from wow.bench import main
+    main()
@@ -0,0 +1,74 @@
+"""Client-side interactivity for the bokeh pages.
+
+With ``WOW_CLIENT_SIDE=1`` a page ships the views of every widget combination
+once, inside a single bokeh document that also holds the widgets. The views
+are small pre-aggregates, and they are keyed by the labels of the widgets
+(``combo_key``). When a widget changes, a ``CustomJS`` callback looks up the
+new combination and swaps the data of the chart sources, the factors of
+their ranges and the text of their headings. The interactions never go back
+to the server, so they cost it no rerun and no CPU.
+
+The store is shipped as one JSON string and parsed by the callback, so that
+it keeps plain JavaScript objects and arrays whatever the bokeh version.
+"""
+import json
+import os
+
+import pandas as pd
+
+ENABLED = os.environ.get('WOW_CLIENT_SIDE', '') not in ('', '0')
+
+SWITCH = '''
+const key = widgets.map((w) => w.labels[w.active]).join('|')
+const view = JSON.parse(store)[key]
+sources.forEach((source, i) => { source.data = view.sources[i] })
+ranges.forEach((range, i) => { range.factors = view.ranges[i] })
+texts.forEach((div, i) => { div.text = view.texts[i] })
+'''
+
+
+def combo_key(*values):
+    return '|'.join(str(value) for value in values)
+
+
+def columns(frame, value=None):
+    """The columns of ``frame`` and its index as plain lists for JSON.
+
+    ``value`` names a metric column to ship as ``value``, so that the charts
+    read the same column whatever the metric.
+    """
+    frame = frame.reset_index()
+    if value is not None:
+        frame = frame.rename(columns={value: 'value'})
+    # JSON has no NaN, bokeh reads null as a missing value
+    return {name: values.astype(object).where(values.notna(), None).tolist()
+            for name, values in frame.items()}
+
+
+def factors(index):
+    # The factors of a categorical range over the labels of an index
+    if isinstance(index, pd.MultiIndex):
+        return [list(map(str, labels)) for labels in index]
+    return [str(label) for label in index]
+
+
+def view(sources, ranges=(), texts=()):
+    return {'sources': list(sources), 'ranges': list(ranges), 'texts': list(texts)}
+
+
+def switcher(widgets, store, sources, ranges=(), texts=()):
+    """Attach the callback that switches ``store`` views to ``widgets``.
+
+    ``widgets`` are button groups, whose active labels joined by
+    ``combo_key`` key the views of ``store``. Each view lists the data of
+    ``sources``, the factors of ``ranges`` and the text of ``texts``, in the
+    order of these models.
+    """
+    from bokeh.models import CustomJS
+
+    callback = CustomJS(args=dict(
+        widgets=list(widgets), store=json.dumps(store), sources=list(sources),
+        ranges=list(ranges), texts=list(texts)), code=SWITCH)
+    for widget in widgets:
+        widget.js_on_change('active', callback)
+    return callback
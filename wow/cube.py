@@ -0,0 +1,95 @@
+"""Pre-aggregated cube for the Customer Profitability dashboard.
+
+The fact table is reduced once to one cell per (Product, Industry, State,
+YearPeriod) with additive Revenue/COGS/Gross Margin sums. Distinct customers
+are kept per cell as a sparse mergeable state from ``wow.distinct`` (the
+exact set of customer codes or a HyperLogLog sketch), so that any rollup
+merges the states of its cells without going back to the rows. Set
+``WOW_DISTINCT=hll`` for the sketches.
+"""
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+from wow import parallel
+from wow.aggregate import DISTINCT, SUMS, TIME_DIMENSIONS, add_ratios, isin_mask
+from wow.distinct import SKETCHES, merge_states
+from wow.trace import stage
+
+DIMENSIONS = ['Product', 'Industry', 'State_y', 'YearPeriod']
+CUSTOMER_KEY = DISTINCT[0]
+# 'exact' or 'hll' for approximate distinct counts
+DISTINCT_SKETCH = os.environ.get('WOW_DISTINCT', 'exact')
+
+
+class Cube:
+
+    def __init__(self, cells, customers, distinct='exact'):
+        self.cells = cells
+        self.customers = customers
+        self.distinct = distinct
+
+    @stage('cube.rollup')
+    def rollup(self, by, products=None, dropna=True):
+        cells = self.cells
+        # The group of every cell, -1 for the cells left out
+        group_ids = np.full(len(cells), -1, dtype=np.int64)
+        rows = slice(None)
+        if products is not None:
+            rows = np.flatnonzero(isin_mask(cells['Product'], products))
+            cells = cells.iloc[rows]
+
+        grouped = cells.groupby(by, dropna=dropna, observed=True)
+        result = grouped[SUMS].sum()
+        group_ids[rows] = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        count = SKETCHES[self.distinct][1]
+        result[CUSTOMER_KEY] = count(self.customers, group_ids, len(result))
+        return add_ratios(result)
+
+
+def _cells(sales, distinct='exact', n_values=None):
+    # Year/Qtr/Month depend on YearPeriod only, they don't refine the grain.
+    grouped = sales.groupby(DIMENSIONS + TIME_DIMENSIONS, dropna=False,
+                            observed=True)
+    cells = grouped[SUMS].sum().reset_index()
+
+    states = SKETCHES[distinct][0]
+    options = {} if n_values is None else {'n_values': n_values}
+    customers = states(grouped.ngroup().to_numpy(dtype=np.int64),
+                       sales[CUSTOMER_KEY].to_numpy(), len(cells), **options)
+    return cells, customers
+
+
+def _merge_cells(partials, distinct):
+    # The same cell may come from several partitions: add up its sums and
+    # merge its distinct states.
+    cells = pd.concat([cells for cells, _ in partials], ignore_index=True)
+    grouped = cells.groupby(DIMENSIONS + TIME_DIMENSIONS, dropna=False,
+                            observed=True)
+    merged = grouped[SUMS].sum().reset_index()
+    customers = merge_states([states for _, states in partials],
+                             grouped.ngroup().to_numpy(dtype=np.int64),
+                             len(merged))
+    return merged, customers
+
+
+@stage('cube.build')
+def build_cube(sales, distinct=DISTINCT_SKETCH, workers=None):
+    """Build the cube, ``distinct`` is 'exact' or 'hll' for approximate counts.
+
+    Large fact tables are reduced to cells on row partitions in parallel.
+    """
+    if not parallel.use(len(sales), workers):
+        return Cube(*_cells(sales, distinct), distinct)
+
+    options = {}
+    if distinct == 'exact':
+        # Customer codes shared by every partition, so their states line up
+        codes, uniques = pd.factorize(sales[CUSTOMER_KEY])
+        sales = sales.assign(**{CUSTOMER_KEY: codes})
+        options['n_values'] = len(uniques)
+    partials = parallel.map_partitions(
+        sales, functools.partial(_cells, distinct=distinct, **options), workers)
+    return Cube(*_merge_cells(partials, distinct), distinct)
@@ -0,0 +1,229 @@
+"""On-disk result cache shared by every Streamlit process of a node.
+
+``st.cache_data`` only lives in the memory of one process, so each replica
+recomputes every loader. ``disk_cache`` sits under it and stores the results
+as content-addressed blobs in ``CACHE_DIR``: the key hashes the function (its
+name and the whole content of its file, so that the page globals and the
+other loaders it calls count too) with its arguments, and arguments naming
+files also hash their size and mtime. DataFrames are stored as Arrow IPC,
+everything else is pickled. Blobs are written atomically, a per-key lock
+stops replicas from computing the same result together, and the least
+recently used blobs are evicted once the cache grows past ``MAX_BYTES``,
+along with the temporary files of killed writers. With ``WOW_TRACE`` set,
+``show_cache_info`` shows the hits and misses of the process in the sidebar.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from wow.trace import TRACE_ENABLED
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, computations may then overlap
+    fcntl = None
+
+CACHE_DIR = Path(os.environ.get('WOW_CACHE_DIR', './data/.cache/results'))
+MAX_BYTES = int(os.environ.get('WOW_CACHE_MAX_BYTES', 512 * 1024**2))
+# Temporary files older than this were left by a writer that was killed.
+STALE_SECONDS = 3600
+
+stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _package_digest():
+    # Results also depend on the helpers of this package, not just the loader.
+    h = hashlib.blake2b(digest_size=16)
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+PACKAGE_DIGEST = _package_digest()
+
+
+def _fingerprint(value):
+    # Arguments naming a file also stand for its current content.
+    if isinstance(value, (str, os.PathLike)) and os.path.isfile(value):
+        stat = os.stat(value)
+        return ('file', os.fspath(value), stat.st_size, stat.st_mtime_ns)
+    return value
+
+
+@functools.lru_cache(maxsize=64)
+def _source_digest(path, size, mtime_ns):
+    # Read again only when the file changes, the stat is part of the key.
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return path
+
+
+def source_digest(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path
+    return _source_digest(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def cache_key(func, args, kwargs, files=()):
+    # The whole file of the function, not just its source: a page loader
+    # also depends on the globals and other loaders of its page. Defaults
+    # count too, as they may come from the environment (e.g. WOW_DISTINCT).
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    payload = pickle.dumps((
+        PACKAGE_DIGEST, source_digest(func.__code__.co_filename), func.__qualname__,
+        [(k, _fingerprint(v)) for k, v in bound.arguments.items()],
+        [_fingerprint(f) for f in files]))
+    return hashlib.blake2b(payload, digest_size=20).hexdigest()
+
+
+def _blob_path(cache_dir, key):
+    return Path(cache_dir) / key[:2] / key
+
+
+def _load(path):
+    arrow = path.with_suffix('.arrow')
+    if arrow.exists():
+        value = feather.read_table(arrow, memory_map=True).to_pandas()
+        return value, arrow
+    pkl = path.with_suffix('.pkl')
+    with open(pkl, 'rb') as f:
+        return pickle.load(f), pkl
+
+
+def _store(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(value, pd.DataFrame):
+                feather.write_feather(value, f, compression='lz4')
+                path = path.with_suffix('.arrow')
+            else:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                path = path.with_suffix('.pkl')
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    # Blobs are touched on every hit, so the oldest mtime is the least
+    # recently used one.
+    blobs = []
+    now = time.time()
+    for path in Path(cache_dir).glob('*/*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.name.startswith('.tmp-') and now - stat.st_mtime > STALE_SECONDS:
+            path.unlink(missing_ok=True)
+        if path.name.startswith('.'):
+            continue
+        blobs.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in blobs)
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        stats['evictions'] += 1
+    return total
+
+
+class _KeyLock:
+    # The lock file is removed on release. A waiter that then holds the lock
+    # of a removed file tries again with the current one.
+
+    def __init__(self, path):
+        self.path = path.with_name(f'.{path.name}.lock')
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self.file.fileno()).st_ino:
+                    return self
+            except FileNotFoundError:
+                pass
+            self.file.close()
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            self.path.unlink(missing_ok=True)
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+
+
+def disk_cache(func=None, *, files=(), cache_dir=None, max_bytes=None):
+    """Cache the results of ``func`` on disk, shared across processes.
+
+    ``files`` lists the data files ``func`` reads without taking them as
+    arguments, so that its results are invalidated when they change.
+    """
+    if func is None:
+        return functools.partial(disk_cache, files=files, cache_dir=cache_dir,
+                                 max_bytes=max_bytes)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        root = cache_dir or CACHE_DIR
+        path = _blob_path(root, cache_key(func, args, kwargs, files))
+        with _KeyLock(path):
+            try:
+                value, blob = _load(path)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                stats['hits'] += 1
+                now = time.time()
+                try:
+                    os.utime(blob, (now, now))
+                except FileNotFoundError:
+                    # Evicted by another process since, the value is loaded
+                    pass
+                return value
+
+            stats['misses'] += 1
+            value = func(*args, **kwargs)
+            _store(path, value)
+        evict(root, max_bytes or MAX_BYTES)
+        return value
+
+    return wrapper
+
+
+def cache_info(cache_dir=None):
+    blobs = [p for p in Path(cache_dir or CACHE_DIR).glob('*/*')
+             if not p.name.startswith('.')]
+    return {**stats, 'entries': len(blobs),
+            'bytes': sum(p.stat().st_size for p in blobs)}
+
+
+def show_cache_info(container, cache_dir=None):
+    # Shown next to the timing panel of wow.trace.
+    if TRACE_ENABLED:
+        info = cache_info(cache_dir)
+        container.caption(
+            f"Disk cache: {info['hits']} hits, {info['misses']} misses, "
+            f"{info['evictions']} evictions, {info['entries']} blobs "
+            f"({info['bytes'] / 1024**2:.1f} MB)")
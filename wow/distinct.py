@@ -0,0 +1,144 @@
+"""Exact and approximate distinct counts with mergeable per-group states.
+
+Values are first mapped to compact integer codes (or 64-bit hashes), then
+summarised per group into a sparse state holding only the entries that are
+set, as sorted (group, key) pairs:
+
+* ``exact``: one entry per distinct code of the group. States merge with a
+  set union and count the entries of each group.
+* ``hll``: one entry per non-empty HyperLogLog register, with its rank.
+  States merge with the maximum rank of each register and count with the
+  HyperLogLog estimator. A group never holds more than ``2 ** precision``
+  entries, however many distinct values it has.
+
+A group with a few values therefore costs a few entries, not a bitmap over
+every value or a full array of registers. A rollup over many groups merges
+their states and never rescans the raw values.
+"""
+import numpy as np
+import pandas as pd
+
+HLL_PRECISION = 12
+
+
+class States:
+    """The (group, key) entries set in ``n_groups`` groups, sorted by group.
+
+    Keys are below ``width``. HyperLogLog states also keep the rank of each
+    entry, exact states have no ``ranks``.
+    """
+
+    def __init__(self, groups, keys, n_groups, width, ranks=None):
+        self.groups = groups
+        self.keys = keys
+        self.n_groups = n_groups
+        self.width = width
+        self.ranks = ranks
+
+    @property
+    def nbytes(self):
+        arrays = [self.groups, self.keys, self.ranks]
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    @classmethod
+    def build(cls, group_ids, keys, n_groups, width, ranks=None):
+        # Group ids follow pandas' ngroup, where -1 marks rows of dropped groups.
+        valid = group_ids >= 0
+        entries = group_ids[valid].astype(np.int64) * width + keys[valid]
+        if ranks is None:
+            entries = np.unique(entries)
+        else:
+            # The highest rank of each entry is last once sorted by rank.
+            ranks = ranks[valid]
+            order = np.lexsort((ranks, entries))
+            entries, ranks = entries[order], ranks[order]
+            last = np.ones(len(entries), dtype=bool)
+            last[:-1] = entries[1:] != entries[:-1]
+            entries, ranks = entries[last], ranks[last]
+        # The smallest integer types that hold the groups and keys
+        groups = pd.to_numeric(entries // width, downcast='unsigned')
+        keys = pd.to_numeric(entries % width, downcast='unsigned')
+        return cls(groups, keys, n_groups, width, ranks)
+
+    def regroup(self, group_ids, n_groups):
+        """Merge the states of the groups into ``group_ids`` (-1 drops a group)."""
+        return States.build(np.asarray(group_ids)[self.groups], self.keys,
+                            n_groups, self.width, self.ranks)
+
+    @staticmethod
+    def concat(states):
+        # The groups of each state follow those of the previous ones.
+        offsets = np.cumsum([0] + [s.n_groups for s in states[:-1]])
+        ranks = None if states[0].ranks is None else np.concatenate(
+            [s.ranks for s in states])
+        return States(
+            np.concatenate([s.groups.astype(np.int64) + o for s, o in zip(states, offsets)]),
+            np.concatenate([s.keys for s in states]),
+            int(sum(s.n_groups for s in states)), states[0].width, ranks)
+
+
+def set_states(cell_ids, values, n_cells, n_values=None):
+    # With n_values, values are already codes below it: the states built
+    # from several partitions of the same codes then line up.
+    if n_values is None:
+        codes, _ = pd.factorize(values)
+        n_values = int(codes.max(initial=-1)) + 1
+    else:
+        codes = np.asarray(values)
+    valid = codes >= 0
+    return States.build(cell_ids[valid], codes[valid], n_cells, max(n_values, 1))
+
+
+def set_count(states, group_ids, n_groups):
+    merged = states.regroup(group_ids, n_groups)
+    return np.bincount(merged.groups, minlength=n_groups).astype(np.int64)
+
+
+def _bit_length(x):
+    # Exact bit length of uint64 values, 32 bits at a time so floats stay exact.
+    hi = (x >> np.uint64(32)).astype(np.float64)
+    lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, 32 + np.frexp(hi)[1], np.frexp(lo)[1])
+
+
+def hll_states(cell_ids, values, n_cells, precision=HLL_PRECISION):
+    values = np.asarray(values)
+    valid = pd.notna(values)
+    hashes = pd.util.hash_array(values[valid])
+    cell_ids = cell_ids[valid]
+
+    width = 64 - precision
+    index = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = hashes & np.uint64((1 << width) - 1)
+    rank = (width - _bit_length(rest) + 1).astype(np.uint8)
+    return States.build(cell_ids, index, n_cells, 1 << precision, rank)
+
+
+def hll_estimate(states):
+    m = states.width
+    alpha = 0.7213 / (1 + 1.079 / m)
+    # The registers without an entry are zero, each adds 2 ** 0 to the sum.
+    filled = np.bincount(states.groups, minlength=states.n_groups)
+    zeros = m - filled
+    total = zeros + np.bincount(states.groups, minlength=states.n_groups,
+                                weights=np.power(2.0, -states.ranks.astype(np.float64)))
+    raw = alpha * m * m / total
+    # Linear counting is more accurate for small cardinalities.
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+def hll_count(states, group_ids, n_groups):
+    merged = states.regroup(group_ids, n_groups)
+    return np.rint(hll_estimate(merged)).astype(np.int64)
+
+
+SKETCHES = {
+    'exact': (set_states, set_count),
+    'hll': (hll_states, hll_count)}
+
+
+def merge_states(states, group_ids, n_groups):
+    """Merge the states of several partitions, ``group_ids`` spans all of them."""
+    return States.concat(states).regroup(group_ids, n_groups)
@@ -0,0 +1,37 @@
+"""Figure skeletons patched with per-rerun data traces.
+
+A page builds the static part of its figure (layout, axes, annotations and
+traces that don't depend on the widgets) once, and freezes it to a plain dict.
+Each rerun only creates the data-dependent traces as dicts and appends them to
+the skeleton, so no ``go.Figure`` is rebuilt nor revalidated trace by trace.
+Rectangles and line segments that used to be one layout shape each are batched
+into a single trace.
+"""
+import numpy as np
+
+
+def freeze(fig):
+    return fig.to_dict()
+
+
+def assemble(skeleton, *traces):
+    # st.plotly_chart accepts the figure as a dict and validates it only once.
+    return {'data': [*skeleton['data'], *traces], 'layout': skeleton['layout']}
+
+
+def band_trace(x, lower, upper, width=1, **kwargs):
+    # Bars sit in the bar layer under scatter traces, like shapes with
+    # layer='below' do, and overlay the other bars when barmode='overlay'.
+    lower = np.asarray(lower)
+    return dict(type='bar', x=np.asarray(x), y=np.asarray(upper) - lower,
+                base=lower, width=width, hoverinfo='skip', showlegend=False,
+                **kwargs)
+
+
+def segments_trace(x0, y0, x1, y1, **kwargs):
+    # One line trace for many segments, separated by NaN gaps.
+    gap = np.full(len(x0), np.nan)
+    xs = np.column_stack([x0, x1, gap]).ravel()
+    ys = np.column_stack([y0, y1, gap]).ravel()
+    return dict(type='scatter', mode='lines', x=xs, y=ys, hoverinfo='skip',
+                showlegend=False, **kwargs)
@@ -0,0 +1,60 @@
+"""Precomputed US states layer for the bokeh map.
+
+The GADM polygons are reprojected to Web Mercator (EPSG:3857) once, simplified
+at a few tolerances and flattened into float32 coordinate arrays per state,
+with the centroids taken from the full resolution geometry. The layers are
+persisted through the Arrow ingest cache, so the request path neither imports
+geopandas nor serializes GeoJSON.
+"""
+import numpy as np
+import pandas as pd
+
+from wow import ingest
+from wow.trace import stage
+
+# Simplification tolerance in metres of each level of detail.
+LEVELS = {'full': 0, 'high': 1000, 'medium': 5000, 'low': 20000}
+
+
+def _exterior_coords(geometry):
+    # The polygons of a multipolygon are separated by NaN, like bokeh patches
+    # and GeoJSONDataSource expect.
+    xs, ys = [], []
+    for polygon in getattr(geometry, 'geoms', [geometry]):
+        x, y = polygon.exterior.coords.xy
+        xs += [np.asarray(x), [np.nan]]
+        ys += [np.asarray(y), [np.nan]]
+    return (np.concatenate(xs[:-1]).astype(np.float32),
+            np.concatenate(ys[:-1]).astype(np.float32))
+
+
+@stage('geo.build_layers')
+def build_layers(geo_file):
+    import geopandas as gpd
+
+    states = gpd.read_file(geo_file).to_crs(epsg=3857)
+    center = states.geometry.centroid
+    layers = {'points': pd.DataFrame(
+        {'NAME_1': states['NAME_1'], 'x': center.x, 'y': center.y})}
+
+    for level, tolerance in LEVELS.items():
+        geometry = states.geometry
+        if tolerance:
+            geometry = geometry.simplify(tolerance, preserve_topology=True)
+        xs, ys = zip(*(_exterior_coords(g) for g in geometry))
+        layers[level] = pd.DataFrame(
+            {'NAME_1': states['NAME_1'], 'xs': list(xs), 'ys': list(ys)})
+    return layers
+
+
+def level_for(width, x_span):
+    # The coarsest level whose tolerance stays under half a screen pixel.
+    half_pixel = x_span / width / 2
+    return max((level for level, tolerance in LEVELS.items()
+                if tolerance <= half_pixel), key=LEVELS.get)
+
+
+def load_states(geo_file, level='medium'):
+    layers = ingest.cached(geo_file, 'geo', {'levels': LEVELS},
+                           lambda: build_layers(geo_file))
+    return {'patches': layers[level], 'points': layers['points']}
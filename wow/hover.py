@@ -0,0 +1,36 @@
+"""Hover templates with named customdata fields.
+
+Templates refer to the data by name, e.g. ``%{customdata.Profit:,.0f}``.
+``hover`` finds the referenced names, packs only those columns into the
+customdata array and rewrites the fields to the ``%{customdata[i]}`` indices
+that plotly expects, so no column goes to the browser unless a template uses
+it and indices never go stale.
+"""
+import re
+
+import numpy as np
+
+FIELD = re.compile(r'%\{customdata\.([^:}]+)(:[^}]*)?\}')
+
+
+def referenced(template):
+    return list(dict.fromkeys(m.group(1) for m in FIELD.finditer(template)))
+
+
+def pack(data, names):
+    columns = [np.asarray(data[name]) for name in names]
+    if all(np.issubdtype(c.dtype, np.number) for c in columns):
+        # Numeric columns travel as one binary typed array.
+        return np.column_stack(columns).astype(np.result_type(*columns))
+    return np.column_stack([c.astype(object) for c in columns])
+
+
+def hover(template, data):
+    """Return the ``hovertemplate`` and ``customdata`` of a trace as a dict."""
+    names = referenced(template)
+    index = {name: i for i, name in enumerate(names)}
+    template = FIELD.sub(
+        lambda m: f'%{{customdata[{index[m.group(1)]}]{m.group(2) or ""}}}',
+        template)
+    return {'hovertemplate': template,
+            'customdata': pack(data, names) if names else None}
@@ -0,0 +1,206 @@
+"""Columnar ingest cache for the source workbooks.
+
+Each source file is converted once into compressed Arrow IPC files (one per
+sheet) under ``CACHE_DIR``. The cache is keyed on the size, mtime and content
+hash of the source, and it rebuilds itself whenever the source changes. Reads
+go through memory mapped Arrow files, so a cold start skips openpyxl entirely.
+When the cache is rebuilt, the sheets of a workbook are parsed in parallel on
+the process pool of ``wow.parallel``.
+"""
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from wow import parallel
+from wow.trace import stage
+
+CACHE_DIR = Path('./data/.cache')
+COMPRESSION = 'lz4'
+MANIFEST = 'manifest.json'
+# Bump this when the on-disk layout changes so that old caches are rebuilt.
+FORMAT_VERSION = 4
+
+
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_digest(path, reader, kwargs):
+    # Sources with the same name in other folders get their own entries.
+    key = json.dumps([str(path.resolve()), reader, kwargs], sort_keys=True, default=str)
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
+def _cache_path(path, reader, kwargs, cache_dir):
+    return Path(cache_dir or CACHE_DIR) / f'{path.stem}-{_entry_digest(path, reader, kwargs)}'
+
+
+def _write_manifest(entry, manifest):
+    # Replaced in one step, readers see either the old or the new manifest.
+    fd, tmp = tempfile.mkstemp(dir=entry, prefix=f'.{MANIFEST}-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, entry / MANIFEST)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _is_fresh(entry, path):
+    manifest_file = entry / MANIFEST
+    if not manifest_file.exists():
+        return False
+    manifest = json.loads(manifest_file.read_text())
+    if manifest.get('version') != FORMAT_VERSION:
+        return False
+    # Data files removed under the manifest, e.g. by a cleanup of the folder
+    if not all((entry / name).exists() for name in manifest['files']):
+        return False
+
+    stat = path.stat()
+    if stat.st_size != manifest['size']:
+        return False
+    if stat.st_mtime_ns == manifest['mtime_ns']:
+        return True
+
+    # The file was touched or copied, only rebuild if the content changed.
+    if file_digest(path) != manifest['hash']:
+        return False
+    manifest['mtime_ns'] = stat.st_mtime_ns
+    _write_manifest(entry, manifest)
+    return True
+
+
+def _column_labels(df):
+    # Arrow only stores string column names, keep the original labels (e.g. the
+    # year columns of a workbook) to restore them on read.
+    return [c.item() if hasattr(c, 'item') else c for c in df.columns]
+
+
+def _to_table(df):
+    df = df.set_axis(df.columns.map(str), axis=1)
+    try:
+        return pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Excel columns may mix numbers and text, store those as text. Blank
+        # cells stay missing.
+        mixed = df.select_dtypes('object').columns
+        return pa.Table.from_pandas(df.assign(
+            **{c: df[c].map(str, na_action='ignore') for c in mixed}))
+
+
+def _write_entry(entry, path, frames):
+    # Each rebuild writes its sheets under a new generation prefix and then
+    # swaps the manifest, so readers never see a partial cache.
+    stat = path.stat()
+    entry.mkdir(parents=True, exist_ok=True)
+    generation = secrets.token_hex(4)
+    files = []
+    try:
+        for i, df in enumerate(frames.values()):
+            files.append(f'{generation}-{i}.arrow')
+            feather.write_feather(_to_table(df), entry / files[-1],
+                                  compression=COMPRESSION)
+        manifest = {'version': FORMAT_VERSION, 'source': str(path),
+                    'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                    'hash': file_digest(path), 'sheets': list(frames),
+                    'files': files,
+                    'columns': [_column_labels(df) for df in frames.values()]}
+        replaced = _listed_files(entry)
+        _write_manifest(entry, manifest)
+    except BaseException:
+        for name in files:
+            (entry / name).unlink(missing_ok=True)
+        raise
+    for name in replaced:
+        (entry / name).unlink(missing_ok=True)
+
+
+def _listed_files(entry):
+    # The data files of the current manifest. Entries from before the
+    # manifest listed them named their files after the sheet position only;
+    # the files of other writers rebuilding the entry must stay.
+    try:
+        manifest = json.loads((entry / MANIFEST).read_text())
+    except FileNotFoundError:
+        return []
+    if 'files' in manifest:
+        return manifest['files']
+    return [f.name for f in entry.glob('*.arrow') if f.stem.isdigit()]
+
+
+def _read_entry(entry, retries=1):
+    manifest = json.loads((entry / MANIFEST).read_text())
+    frames = {}
+    try:
+        for sheet, name, columns in zip(manifest['sheets'], manifest['files'],
+                                        manifest['columns']):
+            df = feather.read_table(entry / name, memory_map=True).to_pandas()
+            frames[sheet] = df.set_axis(columns, axis=1)
+    except FileNotFoundError:
+        # Rebuilt by another process meanwhile, read the new manifest.
+        if not retries:
+            raise
+        return _read_entry(entry, retries - 1)
+    return frames
+
+
+def cached(path, reader, kwargs, parse, cache_dir=None):
+    """Return the frames produced by ``parse()``, rebuilt when ``path`` changes."""
+    path = Path(path)
+    entry = _cache_path(path, reader, kwargs, cache_dir)
+    if not _is_fresh(entry, path):
+        with stage('ingest.parse'):
+            frames = parse()
+        with stage('ingest.write'):
+            _write_entry(entry, path, frames)
+    with stage('ingest.read'):
+        return _read_entry(entry)
+
+
+def _parse_sheet(path, sheet, kwargs):
+    return pd.read_excel(path, sheet_name=sheet, **kwargs)
+
+
+def parse_excel(path, sheet_name=0, workers=None, **kwargs):
+    """``pd.read_excel``, with one worker per sheet when several sheets of a
+    large workbook are read."""
+    workers = workers or parallel.WORKERS
+    several = sheet_name is None or isinstance(sheet_name, list)
+    if workers > 1 and several and os.path.getsize(path) >= parallel.MIN_BYTES:
+        if sheet_name is None:
+            with pd.ExcelFile(path) as workbook:
+                sheet_name = workbook.sheet_names
+        if len(sheet_name) > 1:
+            frames = parallel.starmap(
+                _parse_sheet, [(path, sheet, kwargs) for sheet in sheet_name],
+                min(workers, len(sheet_name)))
+            return dict(zip(sheet_name, frames))
+    return pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+
+
+def read_excel(path, sheet_name=0, cache_dir=None, **kwargs):
+    """Drop-in replacement of ``pd.read_excel`` backed by the Arrow cache."""
+    kwargs['sheet_name'] = sheet_name
+
+    def parse():
+        data = parse_excel(path, **kwargs)
+        return data if isinstance(data, dict) else {sheet_name: data}
+
+    frames = cached(path, 'excel', kwargs, parse, cache_dir)
+    if sheet_name is None or isinstance(sheet_name, list):
+        return frames
+    return next(iter(frames.values()))
+
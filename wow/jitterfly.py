@@ -0,0 +1,71 @@
+"""Precomputed jitterfly data for the Week 19 page.
+
+Per gender, the district populations are stored once as a float32 array of
+age_level x district x year, next to the fixed jitter positions of every
+(age_level, district) point and the per age_level averages. Any pair of years
+is then answered by slicing two year columns, without DataFrame merges.
+The age_level x district sums of large extracts are summed on row partitions
+in parallel (``wow.parallel``).
+"""
+import numpy as np
+import pandas as pd
+
+from wow import parallel
+from wow.trace import stage
+
+
+def _sums(frame):
+    return frame.groupby(['age_level', 'district'], observed=False).sum(numeric_only=True)
+
+
+@stage('jitterfly.age_district_sums')
+def age_district_sums(frame, workers=None):
+    """Sum the populations per (age_level, district), on row partitions in
+    parallel for large frames."""
+    if not parallel.use(len(frame), workers):
+        return _sums(frame)
+    partials = parallel.map_partitions(frame, _sums, workers)
+    return pd.concat(partials).groupby(level=[0, 1], observed=False).sum()
+
+
+@stage('jitterfly.build_store')
+def build_store(sums, avg, years, width=0.9, offset=0.8, seed=123):
+    # sums is indexed by (age_level, district), avg by age_level.
+    frame = sums.reset_index()
+    age_codes, ages = pd.factorize(frame['age_level'])
+    district_codes, districts = pd.factorize(frame['district'])
+
+    pop = np.full((len(ages), len(districts), len(years)), np.nan, dtype=np.float32)
+    pop[age_codes, district_codes] = frame[years].to_numpy(dtype=np.float32)
+
+    # Same jitter as drawing one value per district from a seeded generator
+    jitter = np.random.default_rng(seed).uniform(
+        offset*(-width/2), offset*(width/2), len(districts))
+    ys = np.arange(len(ages))[:, None] + jitter[None, :]
+
+    return {'ages': np.asarray(ages.astype(str)), 'districts': np.asarray(districts),
+            'years': {year: i for i, year in enumerate(years)},
+            'pop': pop, 'ys': ys.astype(np.float32),
+            'avg': avg.loc[ages, years].to_numpy(dtype=np.float32)}
+
+
+@stage('jitterfly.year_pair')
+def year_pair(store, primary, secondary):
+    p, s = store['years'][primary], store['years'][secondary]
+    pop = store['pop']
+    observed = ~np.isnan(pop[:, :, p])
+    age_idx, district_idx = np.nonzero(observed)
+
+    primary_pop = pop[:, :, p][observed]
+    secondary_pop = pop[:, :, s][observed]
+    pct = (primary_pop - secondary_pop) / secondary_pop
+    return {
+        'age': store['ages'][age_idx],
+        'district': store['districts'][district_idx],
+        'y': store['ys'][observed],
+        'primary': primary_pop,
+        'secondary': secondary_pop,
+        'pop_diff_pct': pct,
+        'icon': np.where(pct > 0, '▲', '▼'),
+        'avg_primary': store['avg'][:, p],
+        'avg_secondary': store['avg'][:, s]}
@@ -0,0 +1,78 @@
+"""Lazy imports for the heavy plotting libraries.
+
+``lazy_import('bokeh.models')`` returns a module proxy that only imports the
+real module on first attribute access, so that a page pays for a library when
+the code path using it runs, not when the script starts. Each deferred import
+is timed and reported in the style of ``python -X importtime``, per page: a
+page shows the imports it paid for on its first run in the process, and the
+modules another page had already imported as costing nothing.
+"""
+import importlib
+import os
+import sys
+import time
+import types
+
+# Set WOW_IMPORT_REPORT=1 to show the import report on every page.
+REPORT_ENABLED = os.environ.get('WOW_IMPORT_REPORT', '') not in ('', '0')
+
+# page script -> module -> (cumulative seconds, number of modules pulled in)
+import_times = {}
+
+
+def _caller_page(depth=2):
+    # The page script calling into this module: Streamlit runs every page
+    # with its own path as __file__.
+    return sys._getframe(depth).f_globals.get('__file__')
+
+
+def _record(page, name, seconds, count):
+    # The first run of a page is the one that pays for its imports.
+    import_times.setdefault(page, {}).setdefault(name, (seconds, count))
+
+
+class LazyModule(types.ModuleType):
+
+    def __init__(self, name, page=None):
+        super().__init__(name)
+        self._page = page
+
+    def _load(self):
+        name = self.__name__
+        module = sys.modules.get(name)
+        if module is None or module is self:
+            before = len(sys.modules)
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            _record(self._page, name, time.perf_counter() - start,
+                    len(sys.modules) - before)
+        else:
+            _record(self._page, name, 0.0, 0)
+        # Later lookups hit the proxy's own dict and skip __getattr__.
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name):
+    page = _caller_page()
+    module = sys.modules.get(name)
+    if module is not None:
+        _record(page, name, 0.0, 0)
+        return module
+    return LazyModule(name, page)
+
+
+def format_report(page):
+    lines = ['import time: cumulative [us] | modules | imported package']
+    for name, (seconds, count) in import_times.get(page, {}).items():
+        lines.append(f'import time: {seconds * 1e6:>15.0f} | {count:>7} | {name}')
+    return '\n'.join(lines)
+
+
+def show_import_report(container):
+    # Call at the end of a page script, once its code paths have run.
+    if REPORT_ENABLED:
+        container.expander('Import time report').code(format_report(_caller_page()))
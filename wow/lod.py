@@ -0,0 +1,55 @@
+"""Level of detail for the time-series line charts.
+
+The line views are rolled up at every time grain of the date dimension, from
+months to years. ``choose`` then picks the finest grain whose points still
+get ``MIN_PIXELS`` of the chart width each, so that a longer history moves
+the chart to coarser grains instead of growing its factors and points. When
+even the coarsest grain has too many points, it is downsampled with
+Largest-Triangle-Three-Buckets, which keeps the visual peaks and troughs.
+"""
+import numpy as np
+
+# Time grains of the date dimension, from the finest to the coarsest
+LEVELS = {
+    'month': ['Year', 'Qtr', 'Month'],
+    'quarter': ['Year', 'Qtr'],
+    'year': ['Year']}
+MIN_PIXELS = 8
+
+
+def budget(width, min_pixels=MIN_PIXELS):
+    return max(int(width // min_pixels), 3)
+
+
+def lttb(y, threshold):
+    """Indices of the ``threshold`` points of ``y`` kept by LTTB."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    x = np.arange(n, dtype=np.float64)
+    # The first and last points are kept, the others split into buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        # The next bucket is represented by its average point
+        nxt = slice(stop, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        ax, ay = x[keep[i]], y[keep[i]]
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        keep[i + 1] = start + int(np.argmax(area))
+    return keep
+
+
+def choose(levels, width):
+    """Return the level and the frame to draw in a chart ``width`` pixels wide.
+
+    ``levels`` maps each level of ``LEVELS`` to its line view.
+    """
+    points = budget(width)
+    for level, frame in levels.items():
+        if len(frame) <= points:
+            return level, frame
+    return level, frame.iloc[lttb(frame.iloc[:, 0].to_numpy(), points)]
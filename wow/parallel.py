@@ -0,0 +1,102 @@
+"""Partitioned aggregation of large fact tables on a process pool.
+
+``map_partitions`` writes the frame once as an uncompressed Arrow IPC file,
+in shared memory (``/dev/shm``) where there is one with room for it, else
+in the temporary directory. Every worker
+memory-maps the file and converts only its own slice of rows, so no
+partition is pickled to the pool. Each worker returns a small partial
+aggregate (sums per group, distinct states), and the caller merges the
+partials: sums add up and distinct states merge like the cube's cells do.
+
+``starmap`` runs independent calls on the same pool, e.g. one per sheet of a
+workbook.
+
+Frames under ``MIN_ROWS`` rows, workbooks under ``MIN_BYTES``, or a pool of
+one worker, take the serial path, where starting processes would cost more
+than it saves. The pools
+are shut down when the interpreter exits.
+"""
+import atexit
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+WORKERS = int(os.environ.get('WOW_WORKERS', os.cpu_count() or 1))
+MIN_ROWS = int(os.environ.get('WOW_PARALLEL_MIN_ROWS', 1_000_000))
+MIN_BYTES = int(os.environ.get('WOW_PARALLEL_MIN_BYTES', 1 << 20))
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def use(n_rows, workers=None):
+    return (workers or WORKERS) > 1 and n_rows >= MIN_ROWS
+
+
+def _pool(workers):
+    # Spawned, not forked, as the Streamlit server runs many threads
+    with _lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(workers, mp_context=get_context('spawn'))
+        return _pools[workers]
+
+
+@atexit.register
+def _shutdown():
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def _spill_dir(nbytes):
+    # /dev/shm is backed by memory and often far smaller than the disk: use it
+    # only while the file leaves as much again free.
+    if SHM_DIR:
+        stat = os.statvfs(SHM_DIR)
+        if stat.f_bavail * stat.f_frsize >= 2 * nbytes:
+            return SHM_DIR
+    return tempfile.gettempdir()
+
+
+def _run(func, path, start, stop):
+    table = feather.read_table(path, memory_map=True)
+    return func(table.slice(start, stop - start).to_pandas())
+
+
+def bounds(n_rows, partitions):
+    edges = np.linspace(0, n_rows, partitions + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def map_partitions(frame, func, workers=None):
+    """Return ``[func(part) for part in row partitions of frame]``, in parallel.
+
+    ``func`` runs in another process, so it must be a module-level function
+    (or a ``functools.partial`` of one).
+    """
+    workers = workers or WORKERS
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    fd, path = tempfile.mkstemp(dir=_spill_dir(table.nbytes), prefix='wow-',
+                                suffix='.arrow')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            feather.write_feather(table, f, compression='uncompressed')
+        futures = [_pool(workers).submit(_run, func, path, start, stop)
+                   for start, stop in bounds(len(frame), workers)]
+        return [future.result() for future in futures]
+    finally:
+        os.unlink(path)
+
+
+def starmap(func, calls, workers=None):
+    """Return ``[func(*args) for args in calls]``, one call per task of the pool."""
+    futures = [_pool(workers or WORKERS).submit(func, *args) for args in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,51 @@
+"""Incremental pivot of running sums per (dimension, period) cell.
+
+``IncrementalPivot`` keeps a dense float64 matrix with one row per dimension
+label and one column per period. Appended rows are scattered into their cells
+with ``np.add.at``, new labels grow the matrix, and nothing already absorbed
+is ever recomputed. Derived views such as the cumulative share of each period
+are computed from the matrix with vectorized NumPy operations.
+"""
+import numpy as np
+import pandas as pd
+
+from wow.trace import stage
+
+
+class IncrementalPivot:
+
+    def __init__(self, columns):
+        self.columns = pd.Index(columns)
+        self.rows = pd.Index([])
+        self.sums = np.zeros((0, len(self.columns)))
+
+    def add(self, rows, columns, values):
+        rows, columns = pd.Series(rows), pd.Series(columns)
+        new = pd.Index(rows.unique().astype(object)).difference(self.rows)
+        if len(new):
+            self.rows = self.rows.append(new) if len(self.rows) else new
+            self.sums = np.vstack([self.sums, np.zeros((len(new), len(self.columns)))])
+
+        row_idx = self.rows.get_indexer(rows)
+        col_idx = self.columns.get_indexer(columns)
+        valid = col_idx >= 0
+        np.add.at(self.sums, (row_idx[valid], col_idx[valid]),
+                  np.asarray(values, dtype=np.float64)[valid])
+        return self
+
+    def _sorted(self):
+        order = np.argsort(self.rows.astype(str))
+        return self.rows[order], self.sums[order]
+
+    def frame(self):
+        rows, sums = self._sorted()
+        return pd.DataFrame(sums, index=rows, columns=self.columns)
+
+    @stage('pivot.cumulative_pct')
+    def cumulative_pct(self):
+        # Share of each row total reached by the end of every period.
+        rows, sums = self._sorted()
+        totals = sums.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(totals != 0, sums / totals, 0)
+        return rows, np.cumsum(share, axis=1)
@@ -0,0 +1,42 @@
+"""Background loading of the inputs a page only needs later in its run.
+
+``submit`` starts a loader on its own thread and returns its future, so a
+slow input (e.g. the map geometry) loads while the script aggregates and
+renders everything that doesn't depend on it. The page then waits on the
+future right where the input is used, behind a placeholder.
+
+The thread carries the ScriptRunContext of the script that submitted it, so
+the ``st.cache_data`` functions it calls show their spinner and don't warn
+about a missing context. ``WOW_PREFETCH=0`` runs the loaders inline, in the
+order they are submitted.
+"""
+import os
+import threading
+from concurrent.futures import Future
+
+ENABLED = os.environ.get('WOW_PREFETCH', '1') not in ('', '0')
+
+
+def _run(future, func, args, kwargs):
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+
+
+def submit(func, *args, **kwargs):
+    """Return the future of ``func(*args, **kwargs)``, run in the background."""
+    future = Future()
+    if not ENABLED:
+        _run(future, func, args, kwargs)
+        return future
+
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+    thread = threading.Thread(target=_run, args=(future, func, args, kwargs),
+                              name='prefetch', daemon=True)
+    # Attached before start, as the context is read when the thread first
+    # calls into Streamlit.
+    add_script_run_ctx(thread, get_script_run_ctx(suppress_warning=True))
+    thread.start()
+    return future
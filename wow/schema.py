@@ -0,0 +1,87 @@
+"""Schema-driven dtype compaction of the fact tables.
+
+A schema maps each column kept in a frame to its role:
+
+* ``key``: integer keys, downcast to the smallest integer type;
+* ``dimension``: low-cardinality labels, stored as categoricals (or as the
+  given ``CategoricalDtype``, e.g. to keep the months ordered);
+* ``measure``: numbers, downcast only where every value survives the cast;
+* ``year``: a small integer, shown as text by ``display``.
+
+``compact`` drops every column the schema doesn't list, so the join keys of
+the merges that built the frame go with it.
+"""
+import numpy as np
+import pandas as pd
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# The Customer Profitability star: the facts and the dimensions they use
+FACTSALES = {
+    'YearPeriod': 'key',
+    'Customer Key': 'key',
+    'Product Key': 'key',
+    'Revenue': 'measure',
+    'COGS': 'measure',
+    'Gross Margin': 'measure'}
+PRODUCT = {'Product': 'dimension'}
+CUSTOMER = {'Industry': 'dimension', 'State_y': 'dimension'}
+DATE = {
+    'Year': 'year',
+    'Qtr': 'dimension',
+    'Month': pd.CategoricalDtype(MONTHS, ordered=True)}
+
+# How the compact columns are shown in the views
+DISPLAY = {'Year': str}
+
+
+def _compact_column(values, role):
+    if isinstance(role, pd.CategoricalDtype):
+        return values.astype(role)
+    if role == 'dimension':
+        return values.astype('category')
+    if role in ('key', 'year'):
+        return pd.to_numeric(values, downcast='integer')
+    if role == 'measure':
+        # float32 only when every value survives the round trip exactly:
+        # pandas' own downcast accepts values off by up to 5e-4.
+        values = pd.to_numeric(values)
+        small = values.astype('float32')
+        return small if small.astype(values.dtype).equals(values) else values
+    raise ValueError(f'Unknown column role {role!r}')
+
+
+def compact(frame, schema):
+    return pd.DataFrame({column: _compact_column(frame[column], role)
+                         for column, role in schema.items()})
+
+
+def display(frame, formatters=DISPLAY):
+    """Turn categorical and compact index levels back into display labels."""
+    index = frame.index
+    levels = [index.get_level_values(i) for i in range(index.nlevels)]
+    labels = []
+    for level in levels:
+        values = level.astype(object) if isinstance(level, pd.CategoricalIndex) else level
+        if level.name in formatters:
+            values = values.map(formatters[level.name])
+        labels.append(values)
+    if index.nlevels > 1:
+        frame.index = pd.MultiIndex.from_arrays(labels, names=index.names)
+    else:
+        frame.index = pd.Index(labels[0], name=index.name)
+    return frame
+
+
+def memory_usage(parts):
+    # Deep size of a frame, a series or a list of them
+    if isinstance(parts, (pd.DataFrame, pd.Series)):
+        parts = [parts]
+    return int(sum(np.sum(part.memory_usage(deep=True)) for part in parts))
+
+
+def memory_saved(before, after):
+    before_bytes, after_bytes = memory_usage(before), memory_usage(after)
+    return {'before_bytes': before_bytes, 'after_bytes': after_bytes,
+            'ratio': before_bytes / max(after_bytes, 1)}
@@ -0,0 +1,87 @@
+"""Star schema of a fact table with integer foreign keys.
+
+The fact table keeps its foreign keys and measures only. Each dimension table
+is reduced to the attributes the views use, dictionary-encoded once (as
+categoricals, or small integers) over its own few rows. ``Star.rollup``
+groups the facts on their integer foreign keys first, then finds the
+dimension row of each group and takes its attributes, as category codes.
+The attributes are thus never joined to the fact rows, only to the groups.
+Large fact tables are summed on row partitions in parallel.
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from wow import parallel
+from wow.aggregate import SUMS
+from wow.schema import compact
+
+
+class Dimension:
+    """The ``attributes`` (name to schema role) of ``table``, keyed by ``key``.
+
+    ``missing`` labels an attribute for the facts whose key isn't in the table
+    and for the empty values of the table.
+    """
+
+    def __init__(self, table, key, attributes, missing=None):
+        self.keys = pd.Index(table[key])
+        self.missing = missing or {}
+        self.columns = {}
+        for name, role in attributes.items():
+            values = table[name]
+            if name in self.missing:
+                # One more row, at position len(keys), for the missing keys
+                label = self.missing[name]
+                values = pd.concat([values.fillna(label), pd.Series([label])],
+                                   ignore_index=True)
+            self.columns[name] = compact(values.to_frame(name), {name: role})[name]
+
+    def lookup(self, keys):
+        return self.keys.get_indexer(keys)
+
+    def take(self, name, positions):
+        if name in self.missing:
+            positions = np.where(positions < 0, len(self.keys), positions)
+        values = pd.api.extensions.take(self.columns[name].values, positions,
+                                        allow_fill=True)
+        return pd.Series(values, name=name)
+
+
+def _sum_by(fact, keys, sums):
+    return fact.groupby(keys, dropna=False, sort=False)[sums].sum().reset_index()
+
+
+class Star:
+
+    def __init__(self, fact, schema, dimensions):
+        # dimensions maps each foreign key of the fact table to its Dimension
+        self.fact = compact(fact, schema)
+        self.dimensions = dimensions
+        self.owners = {name: key for key, dim in dimensions.items()
+                       for name in dim.columns}
+
+    def rollup(self, columns, sums=SUMS, workers=None):
+        """Sum ``sums`` per combination of the foreign keys, with the
+        ``columns`` attributes of each group next to its keys."""
+        keys = list(self.dimensions)
+        if parallel.use(len(self.fact), workers):
+            # The same keys may come from several partitions: sum them again.
+            partials = parallel.map_partitions(
+                self.fact[keys + sums],
+                functools.partial(_sum_by, keys=keys, sums=sums), workers)
+            result = _sum_by(pd.concat(partials, ignore_index=True), keys, sums)
+        else:
+            result = _sum_by(self.fact, keys, sums)
+        for name in columns:
+            if name not in result:
+                key = self.owners[name]
+                dim = self.dimensions[key]
+                result[name] = dim.take(name, dim.lookup(result[key]))
+        return result
+
+    def parts(self):
+        # Every column held, for memory reports
+        return [self.fact] + [column for dim in self.dimensions.values()
+                              for column in dim.columns.values()]
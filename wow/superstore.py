@@ -0,0 +1,57 @@
+"""Chunked, typed loader for Superstore-style CSV extracts.
+
+The extracts store currency and percentages as text ("$1,706", "-$4", "16%")
+and dates as m/d/Y. Every chunk is parsed with explicit dtypes, categorical
+low-cardinality fields, vectorized currency/percent converters and a fixed
+date format. ``read_chunks`` yields the chunks one at a time, so that a
+consumer such as ``wow.pivot.IncrementalPivot`` only ever holds one chunk
+plus its running sums in memory, whatever the size of the file.
+"""
+import pandas as pd
+
+CATEGORIES = ['Category', 'Sub-Category', 'Segment', 'Region', 'Ship Mode',
+              'State', 'Country/Region']
+CURRENCY = ['Sales', 'Profit']
+PERCENT = ['Profit Ratio', 'Discount']
+DATES = ['Order Date', 'Ship Date']
+DATE_FORMAT = '%m/%d/%Y'
+DTYPES = {
+    **{c: 'category' for c in CATEGORIES},
+    **{c: 'str' for c in CURRENCY + PERCENT + DATES},
+    'Postal Code': 'str',
+    'Quantity': 'int32',
+    'Number of Records': 'int32'}
+
+CHUNKSIZE = 100_000
+
+
+def parse_currency(values):
+    values = values.str.replace('$', '', regex=False).str.replace(',', '', regex=False)
+    return values.astype('float64')
+
+
+def parse_percent(values):
+    return values.str.rstrip('%').astype('float32') / 100
+
+
+def convert(chunk):
+    for c in CURRENCY:
+        if c in chunk:
+            chunk[c] = parse_currency(chunk[c])
+    for c in PERCENT:
+        if c in chunk:
+            chunk[c] = parse_percent(chunk[c])
+    for c in DATES:
+        if c in chunk:
+            chunk[c] = pd.to_datetime(chunk[c], format=DATE_FORMAT)
+    return chunk
+
+
+def read_chunks(path, chunksize=CHUNKSIZE, usecols=None):
+    dtypes = DTYPES if usecols is None else {
+        c: t for c, t in DTYPES.items() if c in usecols}
+    with pd.read_csv(path, encoding='utf-8-sig', dtype=dtypes, usecols=usecols,
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield convert(chunk)
+
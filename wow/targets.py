@@ -0,0 +1,31 @@
+"""Target-vs-actual monthly view for the Week 21 page.
+
+The orders are summed once into a (Year, Month) table covering every year of
+the workbook, so that switching years is an index lookup in that table.
+Months are classified against their target with one vectorized
+``np.select`` over the whole year.
+"""
+import numpy as np
+
+ABOVE, ON, BELOW = 'Above Target', 'On Target', 'Below Target'
+
+
+def monthly_table(orders, date='Order Date', values=('Profit', 'Target Profit')):
+    dates = orders[date]
+    return orders.groupby([dates.dt.year.rename('Year'),
+                           dates.dt.month.rename('Month')])[list(values)].sum()
+
+
+def classify(actual, target, tolerance):
+    """Return the labels and the lower/upper bounds of the tolerance band."""
+    lower, upper = target * (1 - tolerance), target * (1 + tolerance)
+    labels = np.select([actual > upper, actual < lower], [ABOVE, BELOW], ON)
+    return labels, lower, upper
+
+
+def year_view(table, year, tolerance, actual='Profit', target='Target Profit'):
+    view = table.loc[year].reset_index()
+    view['labels'], view['lower'], view['upper'] = classify(
+        view[actual].to_numpy(), view[target].to_numpy(), tolerance)
+    view['diff'] = (view[actual] - view[target]) / view[target]
+    return view
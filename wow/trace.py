@@ -0,0 +1,177 @@
+"""Per-rerun timing breakdown of the loader and chart-building stages.
+
+``stage(name)`` works both as a decorator and as a context manager. While a
+page rerun is being traced (between ``start`` and ``show_trace``), every stage
+run by the script thread records its wall time, CPU time and resident memory
+delta; nested stages are kept with their depth. At the end of the rerun the
+stages are shown in a sidebar expander and appended to ``TRACE_FILE``, as
+JSON lines or, for a ``.prom`` file, rewritten as Prometheus text with the
+running totals of the process.
+
+Tracing is decided at import time: when ``WOW_TRACE`` is unset, ``stage``
+returns the decorated function itself and a shared no-op context manager.
+"""
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Set WOW_TRACE=1 to trace the reruns and show the timing panel, and
+# WOW_TRACE_FILE to export them as JSON lines or Prometheus text (.prom).
+TRACE_ENABLED = os.environ.get('WOW_TRACE', '') not in ('', '0')
+TRACE_FILE = os.environ.get('WOW_TRACE_FILE')
+
+_local = threading.local()
+_lock = threading.Lock()
+
+# Running totals per (page, stage) for the Prometheus export
+totals = {}
+
+
+def _rss():
+    # Current resident size, the peak where /proc is not available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class _NoStage:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NO_STAGE = _NoStage()
+
+
+class _Stage:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is not None:
+            # Listed when they start, filled in when they end
+            record = {'stage': self.name, 'depth': len(stack)}
+            _local.stages.append(record)
+            stack.append((record, time.perf_counter(), time.thread_time(), _rss()))
+        return self
+
+    def __exit__(self, *exc):
+        stack = getattr(_local, 'stack', None)
+        if stack:
+            record, wall, cpu, rss = stack.pop()
+            record.update(wall_s=time.perf_counter() - wall,
+                          cpu_s=time.thread_time() - cpu,
+                          rss_delta_bytes=_rss() - rss)
+        return False
+
+    def __call__(self, func):
+        # functools.wraps also keeps attributes such as st.cache_data's clear()
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def stage(name):
+    return _Stage(name) if TRACE_ENABLED else _NO_STAGE
+
+
+def start(page):
+    # Call at the top of a page script, stages run before are not recorded.
+    if TRACE_ENABLED:
+        _local.page = page
+        _local.stack = []
+        _local.stages = []
+        _local.started = (time.perf_counter(), time.thread_time(), _rss())
+
+
+def _finish():
+    wall, cpu, rss = _local.started
+    stages = [{'stage': 'rerun', 'depth': -1,
+               'wall_s': time.perf_counter() - wall,
+               'cpu_s': time.thread_time() - cpu,
+               'rss_delta_bytes': _rss() - rss}] + _local.stages
+    _local.stack = None
+    return {'time': time.time(), 'page': _local.page, 'stages': stages}
+
+
+def format_rerun(rerun):
+    lines = ['    wall [ms] |  cpu [ms] | rss [MB] | stage']
+    for s in rerun['stages']:
+        lines.append(f'{s["wall_s"] * 1e3:>13.1f} | {s["cpu_s"] * 1e3:>9.1f} | '
+                     f'{s["rss_delta_bytes"] / 1024**2:>+8.1f} | '
+                     f'{"  " * (s["depth"] + 1)}{s["stage"]}')
+    return '\n'.join(lines)
+
+
+def format_prometheus():
+    metrics = [('wow_stage_calls_total', 'counter', 'calls', 'Stage runs.'),
+               ('wow_stage_wall_seconds_total', 'counter', 'wall_s',
+                'Wall time spent in the stage.'),
+               ('wow_stage_cpu_seconds_total', 'counter', 'cpu_s',
+                'CPU time of the script thread spent in the stage.'),
+               # Deltas may be negative, growth and shrink are counted apart
+               ('wow_stage_rss_growth_bytes_total', 'counter', 'rss_growth_bytes',
+                'Resident memory grown during the stage.'),
+               ('wow_stage_rss_shrink_bytes_total', 'counter', 'rss_shrink_bytes',
+                'Resident memory released during the stage.')]
+    lines = []
+    for metric, kind, field, text in metrics:
+        lines += [f'# HELP {metric} {text}', f'# TYPE {metric} {kind}']
+        for (page, name), total in sorted(totals.items()):
+            page, name = json.dumps(page), json.dumps(name)
+            lines.append(f'{metric}{{page={page},stage={name}}} {total[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+def export(rerun, path=None):
+    path = path or TRACE_FILE
+    if not path:
+        return
+    with _lock:
+        for s in rerun['stages']:
+            total = totals.setdefault((rerun['page'], s['stage']), {
+                'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                'rss_growth_bytes': 0, 'rss_shrink_bytes': 0})
+            total['calls'] += 1
+            for field in ('wall_s', 'cpu_s'):
+                total[field] += s[field]
+            total['rss_growth_bytes'] += max(s['rss_delta_bytes'], 0)
+            total['rss_shrink_bytes'] += max(-s['rss_delta_bytes'], 0)
+
+        path = Path(path)
+        if path.suffix == '.prom':
+            # Written whole and atomically, for a node exporter textfile collector
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'w') as f:
+                f.write(format_prometheus())
+            os.replace(tmp, path)
+        else:
+            with open(path, 'a') as f:
+                f.write(json.dumps(rerun) + '\n')
+
+
+def show_trace(container):
+    # Call at the end of a page script, once its stages have run.
+    if TRACE_ENABLED and getattr(_local, 'stack', None) is not None:
+        rerun = _finish()
+        export(rerun)
+        container.expander('Timing breakdown').code(format_rerun(rerun))
@@ -0,0 +1,159 @@
+"""Background warm-up of the page loaders over their whole widget space.
+
+Each page declares the parameter space of its cached loaders with ``warm``.
+The first declaration of a page enumerates every combination, defaults first
+and then by how many widgets differ from their defaults, and computes them on
+a thread pool in the background. The results land in the loader caches
+(``st.cache_data`` and the shared ``disk_cache``), so the first user to touch
+a combination only pays for a cache hit.
+
+The warm-up threads belong to no session, so they run the loaders without a
+``ScriptRunContext`` (a session's context would show their cache spinners in
+that session's page). Streamlit's warning about the missing context is
+silenced for these threads only.
+
+At server start, ``python -m wow.warmup pages/*.py`` runs each page in
+Streamlit's bare mode up to its ``warm`` calls and fills the shared disk
+cache before the replicas serve any request.
+"""
+import heapq
+import itertools
+import logging
+import os
+import runpy
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 0 turns the warm-up off
+WORKERS = int(os.environ.get('WOW_WARMUP_WORKERS', 2))
+THREAD_PREFIX = 'warmup'
+
+logger = logging.getLogger(__name__)
+
+
+class _WarmupThreadFilter(logging.Filter):
+
+    def filter(self, record):
+        return not threading.current_thread().name.startswith(THREAD_PREFIX)
+
+
+def _silence_context_warnings():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    logger = logging.getLogger(get_script_run_ctx.__module__)
+    if not any(isinstance(f, _WarmupThreadFilter) for f in logger.filters):
+        logger.addFilter(_WarmupThreadFilter())
+
+
+class StopPage(Exception):
+    """Raised by ``warm`` to stop a page once it is registered from the CLI."""
+
+
+class Scheduler:
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.collect_only = False
+        self.pages = {}
+        self.queue = []
+        self.lock = threading.Lock()
+        self.counter = itertools.count()
+        self.pool = None
+
+    def register(self, page, func, space, default):
+        with self.lock:
+            if page in self.pages:
+                return
+            names = list(space)
+            combos = [dict(zip(names, values))
+                      for values in itertools.product(*space.values())]
+            state = self.pages[page] = {'total': len(combos), 'done': 0,
+                                        'failed': 0, 'started': time.time()}
+            for kwargs in combos:
+                priority = sum(kwargs[n] != default.get(n, kwargs[n]) for n in names)
+                heapq.heappush(self.queue, (priority, next(self.counter), state, func, kwargs))
+
+        if self.collect_only:
+            raise StopPage(page)
+        self.start()
+
+    def start(self):
+        if not self.workers:
+            return
+        with self.lock:
+            if self.pool is None:
+                _silence_context_warnings()
+                self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix=THREAD_PREFIX)
+            for _ in range(min(self.workers, len(self.queue))):
+                self.pool.submit(self._work)
+
+    def _work(self):
+        while True:
+            with self.lock:
+                if not self.queue:
+                    return
+                _, _, state, func, kwargs = heapq.heappop(self.queue)
+            try:
+                func(**kwargs)
+            except Exception:
+                logger.exception('Warm-up of %s failed for %s',
+                                 getattr(func, '__qualname__', func), kwargs)
+                outcome = 'failed'
+            else:
+                outcome = 'done'
+            with self.lock:
+                state[outcome] += 1
+
+    def progress(self):
+        return {page: dict(state) for page, state in self.pages.items()}
+
+    def wait(self, interval=0.5):
+        while any(s['done'] + s['failed'] < s['total'] for s in self.pages.values()):
+            time.sleep(interval)
+
+
+scheduler = Scheduler()
+
+
+def warm(page, func, space=None, default=None):
+    """Compute ``func`` over every combination of ``space`` in the background.
+
+    ``space`` maps each keyword argument of ``func`` to its possible values and
+    ``default`` gives the values the page starts with, which are warmed first.
+    """
+    scheduler.register(page, func, space or {}, default or {})
+
+
+def show_progress(container, page):
+    state = scheduler.pages.get(page)
+    if state and state['done'] + state['failed'] < state['total']:
+        container.progress(state['done'] / state['total'],
+                           text=f'Warming up {state["done"]}/{state["total"]}')
+
+
+def main(paths):
+    scheduler.collect_only = True
+    for path in paths:
+        try:
+            runpy.run_path(path, run_name='__warmup__')
+        except StopPage:
+            pass
+        except Exception as e:
+            print(f'{path}: {e!r}', file=sys.stderr)
+    scheduler.collect_only = False
+    scheduler.start()
+
+    start = time.time()
+    scheduler.wait()
+    for page, state in scheduler.progress().items():
+        print(f'{page}: {state["done"]}/{state["total"]} warmed, '
+              f'{state["failed"]} failed')
+    print(f'warm-up took {time.time() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    # The pages import wow.warmup, which is not this __main__ module.
+    from wow.warmup import main
+    main(sys.argv[1:])